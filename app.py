@@ -1,35 +1,182 @@
 import os
+import click
 from flask import Flask
 from flask_cors import CORS
 from src.extensions import db, bcrypt, migrate
+from src.models import upgrade_schema
+from src.search import DEFAULT_TOKENIZER, create_search_index, is_supported, rebuild_search_index
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     CORS(app, supports_credentials=True)
 
     if os.path.exists('instance/config.py'):
         app.config.from_pyfile('instance/config.py')
+    if config:
+        app.config.update(config)  # 覆盖配置文件中的同名项（用于测试）
+
+    # 日志配置（队列异步输出，需在其他模块记录日志之前完成）
+    from src.logging_setup import setup_logging
+    setup_logging(app)
 
     # 初始化扩展
     from src.extensions import init_ext
     init_ext(app)
 
+    # 请求剖析与慢请求日志
+    from src.profiling import init_profiling
+    init_profiling(app)
+
+    # 响应压缩
+    from src.compression import init_compression
+    init_compression(app)
+
+    # 聊天记录全文检索索引同步
+    from src.search import init_search
+    init_search(app)
+
     # 注册蓝图
     from src.routers import api_bp
     from src.views import auth_bp
+    from src.health import health_bp
     app.register_blueprint(api_bp)
     app.register_blueprint(auth_bp)
+    app.register_blueprint(health_bp)
+
+    # WebSocket聊天通道
+    from src.ws_chat import init_websocket
+    init_websocket(app)
 
     # 初始化数据库
     @app.cli.command("init-db")
     def init_db():
         with app.app_context():
             db.create_all()
+            with db.engine.begin() as connection:
+                for column in upgrade_schema(connection):
+                    click.echo(f"已添加列：{column}")
+            if app.config.get('SEARCH_ENABLED', True) and is_supported(db.engine):
+                with db.engine.begin() as connection:
+                    create_search_index(connection, app.config.get('SEARCH_TOKENIZER', DEFAULT_TOKENIZER))
+
+    # 批量导入用户
+    @app.cli.command("import-users")
+    @click.argument("input_path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(['csv', 'jsonl']), default=None, help="文件格式，默认按扩展名判断")
+    @click.option("--batch-size", default=1000, show_default=True, help="每批导入的用户数（每批一个事务）")
+    @click.option("--workers", default=None, type=int, help="密码哈希进程数，默认为CPU核数")
+    @click.option("--dry-run", is_flag=True, help="只校验，不写入数据库")
+    def import_users_command(input_path, fmt, batch_size, workers, dry_run):
+        """从CSV/JSONL文件批量导入用户（字段：username、email、password或password_hash、tier）"""
+        from src.user_io import import_users
+
+        with app.app_context():
+            stats = import_users(
+                db.session, input_path,
+                fmt=fmt,
+                batch_size=batch_size,
+                workers=workers,
+                rounds=app.config.get('BCRYPT_LOG_ROUNDS', 12),
+                prefix=app.config.get('BCRYPT_HASH_PREFIX', '2b'),
+                dry_run=dry_run,
+                progress=lambda current: click.echo(
+                    f"\r已处理 {current['read']} 条 {current['rate']:.0f} 条/秒", nl=False
+                )
+            )
+        click.echo(
+            f"\n{'校验完成，可新建' if dry_run else '导入完成，新建'} {stats['created']} 个用户，"
+            f"无效 {stats['invalid']}，文件内重复 {stats['duplicate']}，已存在 {stats['exists']}，"
+            f"耗时 {stats['elapsed_seconds']:.1f}s"
+        )
+        for error in stats['errors']:
+            click.echo(f"  第{error['line']}行：{error['message']}")
+
+    # 导出用户
+    @app.cli.command("export-users")
+    @click.argument("output", type=click.File('w', encoding='utf-8', lazy=False), default='-')
+    @click.option("--format", "fmt", type=click.Choice(['csv', 'jsonl']), default='jsonl', show_default=True)
+    @click.option("--include-hashes", is_flag=True, help="同时导出密码哈希（用于迁移，导出文件需妥善保管）")
+    @click.option("--batch-size", default=1000, show_default=True, help="每次从数据库读取的用户数")
+    def export_users_command(output, fmt, include_hashes, batch_size):
+        """按id顺序流式导出用户到OUTPUT（默认标准输出）"""
+        from src.user_io import export_users
+
+        with app.app_context():
+            count = export_users(db.session, output, fmt=fmt, include_hashes=include_hashes, batch_size=batch_size)
+        click.echo(f"已导出 {count} 个用户", err=True)
+
+    # 重建全文检索索引
+    @app.cli.command("rebuild-search-index")
+    @click.option("--batch-size", default=1000, show_default=True, help="每批导入的消息数")
+    def rebuild_search(batch_size):
+        """删除并重建聊天记录全文检索索引"""
+        with app.app_context():
+            if not is_supported(db.engine):
+                raise click.ClickException("全文检索仅支持SQLite数据库")
+            total = rebuild_search_index(
+                db.session,
+                tokenizer=app.config.get('SEARCH_TOKENIZER', DEFAULT_TOKENIZER),
+                batch_size=batch_size,
+                progress=lambda count: click.echo(f"\r已索引 {count} 条消息", nl=False)
+            )
+            click.echo(f"\n索引重建完成，共 {total} 条消息")
+
+    # 离线批量推理
+    @app.cli.command("batch-infer")
+    @click.argument("input_path", type=click.Path(exists=True, dir_okay=False))
+    @click.argument("output_path", type=click.Path(dir_okay=False))
+    @click.option("--concurrency", default=4, show_default=True, type=click.IntRange(min=1), help="最大并发请求数")
+    @click.option("--id-field", default="id", show_default=True, help="输入记录中的ID字段")
+    @click.option("--prompt-field", default="prompt", show_default=True, help="输入记录中的提示词字段")
+    @click.option("--model", default=None, help="模型名称，默认使用DEFAULT_MODEL")
+    @click.option("--checkpoint-every", default=100, show_default=True, type=click.IntRange(min=1),
+                  help="每完成多少条保存一次检查点")
+    @click.option("--retry-failed/--no-retry-failed", default=True, show_default=True,
+                  help="续跑时是否重新执行此前失败的行")
+    def batch_infer(input_path, output_path, concurrency, id_field, prompt_field, model, checkpoint_every,
+                    retry_failed):
+        """从JSONL文件批量推理，结果增量写入OUTPUT_PATH，中断后重新执行即可续跑"""
+        from src.batch_infer import CheckpointMismatchError, run_batch_inference
+        from src.dk_client import LocalLLMClient, LocalLLMConfig
+
+        client = LocalLLMClient(LocalLLMConfig(
+            endpoint=app.config['DEFAULT_ENDPOINT'],
+            model_name=model or app.config['DEFAULT_MODEL'],
+            temperature=app.config['DEFAULT_TEMPERATURE']
+        ))
+
+        def show_progress(stats):
+            finished = stats['succeeded'] + stats['failed']
+            eta = f"{stats['eta_seconds']:.0f}s" if stats['eta_seconds'] is not None else '-'
+            click.echo(
+                f"\r完成 {finished + stats['skipped']}/{stats['total']}"
+                f"（跳过 {stats['skipped']}，失败 {stats['failed']}）"
+                f" {stats['rate']:.2f} 条/秒 ETA {eta}   ",
+                nl=False
+            )
+
+        try:
+            stats = run_batch_inference(
+                client, input_path, output_path,
+                concurrency=concurrency,
+                id_field=id_field,
+                prompt_field=prompt_field,
+                checkpoint_every=checkpoint_every,
+                retry_failed=retry_failed,
+                progress=show_progress
+            )
+        except CheckpointMismatchError as e:
+            raise click.ClickException(f"无法续跑：{e}（如需重新开始，请删除输出文件及其.ckpt检查点）")
+        click.echo(f"\n批量推理完成：成功 {stats['succeeded']}，失败 {stats['failed']}，"
+                   f"跳过 {stats['skipped']}，重试 {stats['retried']}")
 
     return app
 
 
 if __name__ == '__main__':
+    from src.extensions import health_prober
+
     app = create_app()
+    health_prober.start()
     app.run(port=5001, debug=True)
@@ -0,0 +1,95 @@
+"""响应压缩基准测试：各编码的传输字节数与CPU耗时
+
+用法（在项目根目录执行）：
+    python benchmarks/compression_bench.py [--repeat 200] [--tokens-per-frame 1 8]
+
+输出三种场景：
+- body：整体压缩一个非流式JSON响应
+- stream/N：流式NDJSON响应，每N个token压缩并flush一次
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.compression import COMPRESSORS, DEFAULT_LEVELS, compress_body, compress_stream  # noqa: E402
+
+SAMPLE_PARAGRAPHS = [
+    "量子纠缠是量子力学中的一种现象，指两个或多个粒子在相互作用后，其量子态无法单独描述，只能作为整体来描述。",
+    "当对其中一个粒子进行测量时，另一个粒子的状态会瞬间确定，无论两者相距多远。",
+    "## 基本原理\n\n1. **叠加态**：粒子在测量前处于多个状态的叠加。\n2. **非定域性**：测量结果之间存在超越经典的关联。",
+    "In short, entanglement describes correlations that cannot be explained by any local hidden-variable theory, "
+    "as demonstrated by violations of Bell inequalities in numerous experiments.",
+    "需要注意的是，量子纠缠并不能用于超光速通信，因为单独观察任何一方的测量结果都是完全随机的。",
+]
+
+
+def build_answer(target_bytes: int) -> str:
+    parts = []
+    size = 0
+    index = 0
+    while size < target_bytes:
+        paragraph = SAMPLE_PARAGRAPHS[index % len(SAMPLE_PARAGRAPHS)]
+        parts.append(paragraph)
+        size += len(paragraph.encode('utf-8'))
+        index += 1
+    return "\n\n".join(parts)
+
+
+def tokenize(text: str, chars_per_token: int = 2) -> list[str]:
+    return [text[i:i + chars_per_token] for i in range(0, len(text), chars_per_token)]
+
+
+def ndjson_frames(tokens: list[str], tokens_per_frame: int) -> list[bytes]:
+    frames = []
+    for i in range(0, len(tokens), tokens_per_frame):
+        content = "".join(tokens[i:i + tokens_per_frame])
+        frames.append((json.dumps({'type': 'answer', 'content': content}, ensure_ascii=False) + '\n').encode('utf-8'))
+    frames.append((json.dumps({'type': 'done', 'model': 'deepseek-r1:1.5b'}) + '\n').encode('utf-8'))
+    return frames
+
+
+def measure(fn, repeat: int):
+    started = time.process_time()
+    for _ in range(repeat):
+        output = fn()
+    cpu_ms = (time.process_time() - started) * 1000 / repeat
+    return output, cpu_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--answer-bytes', type=int, default=6000, help='模拟回答大小（字节）')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--tokens-per-frame', type=int, nargs='+', default=[1, 8])
+    args = parser.parse_args()
+
+    answer = build_answer(args.answer_bytes)
+    body = json.dumps({'response': answer, 'status': 'success', 'model': 'deepseek-r1:1.5b'},
+                      ensure_ascii=False).encode('utf-8')
+    tokens = tokenize(answer)
+
+    scenarios = [('body', [body], False)]
+    for n in args.tokens_per_frame:
+        scenarios.append((f'stream/{n}', ndjson_frames(tokens, n), True))
+
+    print(f"{'场景':<12}{'编码':<10}{'原始字节':>10}{'传输字节':>10}{'压缩率':>8}{'CPU ms/响应':>14}")
+    for name, frames, streamed in scenarios:
+        raw = sum(len(f) for f in frames)
+        print(f"{name:<12}{'identity':<10}{raw:>10}{raw:>10}{1.0:>8.2f}{0.0:>14.3f}")
+        for encoding in COMPRESSORS:
+            level = DEFAULT_LEVELS[encoding]
+            if streamed:
+                output, cpu_ms = measure(lambda: list(compress_stream(iter(frames), encoding, level)), args.repeat)
+                wire = sum(len(chunk) for chunk in output)
+            else:
+                output, cpu_ms = measure(lambda: compress_body(frames[0], encoding, level), args.repeat)
+                wire = len(output)
+            print(f"{name:<12}{encoding:<10}{raw:>10}{wire:>10}{wire / raw:>8.2f}{cpu_ms:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
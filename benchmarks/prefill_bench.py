@@ -0,0 +1,68 @@
+"""多轮对话提示词计算耗时对比：/api/chat完整重放 vs /api/generate增量context
+
+用法（需本地运行Ollama，在项目根目录执行）：
+    python benchmarks/prefill_bench.py [--turns 10] [--model deepseek-r1:1.5b]
+
+每种模式依次进行相同的多轮提问，输出每轮的prompt_eval_count与prompt_eval_duration。
+完整重放模式下两者随轮次增长，增量模式下应大致保持不变。
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dk_client import LocalLLMClient, LocalLLMConfig, split_reasoning  # noqa: E402
+
+QUESTIONS = [
+    "用三句话介绍量子纠缠。",
+    "它和经典关联有什么区别？",
+    "贝尔不等式是如何检验这一点的？",
+    "举一个实验的例子。",
+    "这个实验有哪些漏洞？",
+    "后来的实验是如何弥补这些漏洞的？",
+    "量子纠缠能用来超光速通信吗？为什么？",
+    "量子密钥分发如何利用纠缠？",
+    "总结一下我们讨论的要点。",
+    "用一句话概括。",
+]
+
+
+def run_replay(client: LocalLLMClient, turns: int, options: dict):
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": QUESTIONS[turn % len(QUESTIONS)]})
+        result = next(client.generate(messages=messages, options=options))
+        messages.append({"role": "assistant", "content": split_reasoning(result["message"]["content"])[1]})
+        yield result
+
+
+def run_incremental(client: LocalLLMClient, turns: int, options: dict):
+    context = None
+    for turn in range(turns):
+        result = next(client.generate_incremental(QUESTIONS[turn % len(QUESTIONS)], context=context, options=options))
+        context = result.get("context")
+        yield result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoint', default='http://localhost:11434/api/chat')
+    parser.add_argument('--model', default='deepseek-r1:1.5b')
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--num-predict', type=int, default=128, help='每轮最多生成的token数')
+    args = parser.parse_args()
+
+    client = LocalLLMClient(LocalLLMConfig(endpoint=args.endpoint, model_name=args.model))
+    options = {"num_predict": args.num_predict, "temperature": 0}
+
+    for name, runner in (('完整重放(/api/chat)', run_replay), ('增量context(/api/generate)', run_incremental)):
+        print(f"\n{name}")
+        print(f"{'轮次':<6}{'prompt_eval_count':>20}{'prompt_eval_ms':>18}")
+        for turn, result in enumerate(runner(client, args.turns, options), 1):
+            duration_ms = result.get('prompt_eval_duration', 0) / 1e6
+            print(f"{turn:<6}{result.get('prompt_eval_count', 0):>20}{duration_ms:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""聊天记录全文检索基准测试：FTS5索引 vs LIKE全表扫描
+
+用法（在项目根目录执行）：
+    python benchmarks/search_bench.py [--messages 10000000] [--users 10000] [--db /tmp/search_bench.db]
+
+在独立的SQLite文件中生成模拟消息并建立索引，输出建索引耗时、文件大小，
+以及不同类型查询（高频词/低频词/多关键词/短关键词）在随机用户下的延迟分位数。
+LIKE基线只对前--like-limit条消息建表，避免千万级数据下运行过久。
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from src.search import FTS_TABLE, create_search_index, owner_token, search_messages  # noqa: E402
+
+COMMON_WORDS = ["量子", "模型", "数据", "问题", "方法", "系统", "python", "函数", "学习", "网络"]
+RARE_WORDS = ["纠缠态", "贝尔不等式", "黎曼猜想", "拓扑绝缘体", "超导量子比特", "zeroshot", "backpropagation"]
+FILLER = "的了是在和有这个我们可以一种进行通过以及需要使用中对于如果那么因为所以".strip()
+
+
+def generate_message(rng: random.Random) -> str:
+    words = []
+    for _ in range(rng.randint(8, 60)):
+        roll = rng.random()
+        if roll < 0.25:
+            words.append(rng.choice(COMMON_WORDS))
+        elif roll < 0.26:
+            words.append(rng.choice(RARE_WORDS))
+        else:
+            words.append("".join(rng.choices(FILLER, k=rng.randint(2, 6))))
+    return "".join(words)
+
+
+def build(engine, messages: int, users: int, batch_size: int, tokenizer: str, seed: int):
+    rng = random.Random(seed)
+    with engine.begin() as connection:
+        connection.execute(text("PRAGMA journal_mode = WAL"))
+        create_search_index(connection, tokenizer)
+
+    insert = text(
+        f"INSERT INTO {FTS_TABLE} (rowid, content, owner, conversation_id) "
+        f"VALUES (:id, :content, :owner, :conversation_id)"
+    )
+    started = time.perf_counter()
+    for start in range(1, messages + 1, batch_size):
+        rows = []
+        for message_id in range(start, min(start + batch_size, messages + 1)):
+            user_id = rng.randint(1, users)
+            rows.append({
+                'id': message_id,
+                'content': generate_message(rng),
+                'owner': owner_token(user_id),
+                'conversation_id': user_id * 100 + rng.randint(0, 9)
+            })
+        with engine.begin() as connection:
+            connection.execute(insert, rows)
+        print(f"\r已写入 {min(start + batch_size - 1, messages)}/{messages}", end='', flush=True)
+    with engine.begin() as connection:
+        connection.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    print()
+    return time.perf_counter() - started
+
+
+def build_like_baseline(engine, limit: int):
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS message_plain"))
+        connection.execute(text(
+            f"CREATE TABLE message_plain AS SELECT rowid AS id, owner, content FROM {FTS_TABLE} "
+            f"WHERE rowid <= :limit"
+        ), {'limit': limit})
+        connection.execute(text("CREATE INDEX ix_message_plain_owner ON message_plain (owner)"))
+
+
+def percentiles(samples: list[float]) -> str:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return f"p50={p50:8.2f}ms  p95={p95:8.2f}ms"
+
+
+def bench_queries(engine, users: int, rounds: int, tokenizer: str, seed: int, like_limit: int):
+    rng = random.Random(seed + 1)
+    cases = {
+        '高频词': lambda: rng.choice(COMMON_WORDS[6:]),
+        '低频词': lambda: rng.choice(RARE_WORDS),
+        '多关键词': lambda: f"{rng.choice(RARE_WORDS)} {rng.choice(COMMON_WORDS[6:])}",
+        '短关键词(LIKE回退)': lambda: rng.choice(COMMON_WORDS[:6]),
+    }
+    with engine.connect() as connection:
+        for name, make_query in cases.items():
+            fts_samples, scan_samples, like_samples = [], [], []
+            for _ in range(rounds):
+                user_id = rng.randint(1, users)
+                query = make_query()
+
+                started = time.perf_counter()
+                search_messages(connection, user_id, query, limit=21, tokenizer=tokenizer)
+                fts_samples.append((time.perf_counter() - started) * 1000)
+
+                if like_limit:
+                    clauses = ' AND '.join(f"content LIKE :t{i}" for i in range(len(query.split())))
+                    params = {f"t{i}": f"%{term}%" for i, term in enumerate(query.split())}
+                    for owner_filter, samples in (('', scan_samples), ('owner = :owner AND ', like_samples)):
+                        started = time.perf_counter()
+                        connection.execute(text(
+                            f"SELECT id FROM message_plain WHERE {owner_filter}{clauses} "
+                            f"ORDER BY id DESC LIMIT 21"
+                        ), {'owner': owner_token(user_id), **params}).all()
+                        samples.append((time.perf_counter() - started) * 1000)
+
+            print(f"{name:<16} FTS5  {percentiles(fts_samples)}")
+            if like_samples:
+                print(f"{'':<16} LIKE  {percentiles(scan_samples)}  （前{like_limit}条消息，全表扫描）")
+                print(f"{'':<16} LIKE  {percentiles(like_samples)}  （前{like_limit}条消息，owner索引过滤）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--db', default='/tmp/search_bench.db')
+    parser.add_argument('--tokenizer', default='trigram')
+    parser.add_argument('--batch-size', type=int, default=20_000)
+    parser.add_argument('--rounds', type=int, default=200, help='每类查询的执行次数')
+    parser.add_argument('--like-limit', type=int, default=1_000_000, help='LIKE基线的消息数，0表示跳过')
+    parser.add_argument('--reuse', action='store_true', help='复用已有数据库，只执行查询')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.reuse:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    engine = create_engine(f"sqlite:///{args.db}")
+
+    if not args.reuse:
+        elapsed = build(engine, args.messages, args.users, args.batch_size, args.tokenizer, args.seed)
+        print(f"建索引耗时 {elapsed:.1f}s（{args.messages / elapsed:.0f} 条/秒），"
+              f"文件大小 {os.path.getsize(args.db) / 1024 / 1024:.1f}MB")
+    if args.like_limit:
+        build_like_baseline(engine, args.like_limit)
+
+    bench_queries(engine, args.users, args.rounds, args.tokenizer, args.seed, args.like_limit)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""批量导入用户基准测试：逐个注册（与/api/register相同的查询、哈希、提交） vs import_users
+
+用法（在项目根目录执行）：
+    python benchmarks/user_import_bench.py [--users 10000] [--rounds 12] [--workers 8]
+
+在独立的SQLite文件中分别执行两种方式，输出耗时与吞吐量。
+逐个注册只执行前--sequential-limit个用户，再按比例估算全部用户的耗时。
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from src.extensions import bcrypt, db  # noqa: E402
+from src.models import User  # noqa: E402
+from src.user_io import import_users  # noqa: E402
+
+
+def make_app(db_path: str, rounds: int) -> Flask:
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['BCRYPT_LOG_ROUNDS'] = rounds
+    db.init_app(app)
+    bcrypt.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def write_users(path: str, users: int):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['username', 'email', 'password'])
+        writer.writeheader()
+        for i in range(users):
+            writer.writerow({'username': f"user{i}", 'email': f"user{i}@example.com", 'password': f"password{i}"})
+
+
+def run_sequential(app: Flask, users: int) -> float:
+    started = time.perf_counter()
+    with app.app_context():
+        for i in range(users):
+            username, email = f"user{i}", f"user{i}@example.com"
+            if User.query.filter_by(username=username).first() or User.query.filter_by(email=email).first():
+                continue
+            user = User(username=username, email=email)
+            user.set_password(f"password{i}")
+            db.session.add(user)
+            db.session.commit()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt计算轮数')
+    parser.add_argument('--workers', type=int, default=None, help='哈希进程数，默认为CPU核数')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--sequential-limit', type=int, default=200, help='逐个注册实际执行的用户数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'users.csv')
+        write_users(input_path, args.users)
+
+        limit = min(args.users, args.sequential_limit)
+        elapsed = run_sequential(make_app(os.path.join(tmp, 'sequential.db'), args.rounds), limit)
+        estimated = elapsed / limit * args.users
+        print(f"逐个注册   {limit}个用户 {elapsed:.1f}s（{limit / elapsed:.0f} 个/秒），"
+              f"估算{args.users}个用户 {estimated:.0f}s")
+
+        app = make_app(os.path.join(tmp, 'bulk.db'), args.rounds)
+        with app.app_context():
+            stats = import_users(db.session, input_path, batch_size=args.batch_size,
+                                 workers=args.workers, rounds=args.rounds)
+        elapsed = stats['elapsed_seconds']
+        print(f"批量导入   {stats['created']}个用户 {elapsed:.1f}s（{stats['created'] / elapsed:.0f} 个/秒），"
+              f"加速 {estimated / elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""gunicorn配置（gunicorn -c gunicorn.conf.py wsgi:app）
+
+- preload_app：主进程中创建一次应用后再fork工作进程，代码和配置以写时复制方式共享
+- gthread：每个工作进程内用线程池处理请求，适合长时间的流式响应和WebSocket连接
+  （同步worker一个请求占用整个进程，流式生成期间无法处理其他请求）
+- 各工作进程启动后在post_worker_init中调用src.runtime.init_worker，重建线程、连接池和模型客户端
+- 重启或停止时，工作进程停止接受新请求，最多等待graceful_timeout秒让进行中的生成完成
+
+注意：每个工作进程各自持有模型调度器（并发上限、排队上限按进程计算）、验证码和语义缓存（各进程独占一个缓存目录）；
+验证码保存在进程内存中，多个工作进程时登录验证会失败，需先改为Redis等共享存储后再增加GUNICORN_WORKERS。
+"""
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+preload_app = True
+
+# gthread的心跳与请求处理无关，长时间的流式响应不会触发worker超时
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 120))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')  # 默认关闭，请求日志由应用输出
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    # 将主进程中已有的对象移出垃圾回收跟踪，避免子进程中GC扫描时写入这些对象导致内存页被复制
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # 在gunicorn设置信号处理函数之后调用，init_worker中安装的SIGTERM处理函数才不会被覆盖
+    from src.runtime import init_worker
+
+    init_worker(worker.wsgi)
+
@@ -25,3 +25,89 @@ MAIL_DEFAULT_SENDER = ('DeepSeek聊天室', 'hehe@sina.cn')
 # MAIL_PASSWORD = 'xxxxxx'  # 邮件服务器授权码
 PASSWORD_RESET_SALT = 'deepskyblue'
 PASSWORD_RESET_EXPIRE = 3600
+
+# 批量聊天配置
+BATCH_MAX_ITEMS = 100  # 单次批量请求最大条数
+BATCH_MAX_PARALLEL = 4  # 批量请求最大并发数（受限于Ollama的OLLAMA_NUM_PARALLEL）
+
+# 语义缓存配置（需安装numpy，并执行 ollama pull nomic-embed-text）
+SEMANTIC_CACHE_ENABLED = False
+SEMANTIC_CACHE_MODEL = "nomic-embed-text"
+SEMANTIC_CACHE_THRESHOLD = 0.92  # 余弦相似度命中阈值
+SEMANTIC_CACHE_CAPACITY = 10000  # 最大缓存条目数
+SEMANTIC_CACHE_PATH = "instance/semantic_cache"  # 持久化目录，设为None则仅缓存在内存中
+
+# 多轮对话配置
+CHAT_HISTORY_LIMIT = 20  # 每轮请求携带的最近历史消息条数
+
+# 模型路由配置（未配置MODEL_ROUTES时所有请求使用DEFAULT_MODEL）
+# MODEL_ROUTES = {
+#     "fast": {"model_name": "deepseek-r1:1.5b", "max_concurrency": 4},
+#     "large": {"model_name": "deepseek-r1:7b", "max_concurrency": 1},
+# }
+# MODEL_ROUTING_RULES = [  # 按顺序匹配，所有已设置条件均满足时命中
+#     {"route": "large", "mode": "deep"},
+#     {"route": "large", "tiers": ["pro"], "min_prompt_chars": 200},
+#     {"route": "fast", "max_prompt_chars": 200},
+# ]
+# MODEL_DEFAULT_ROUTE = "large"
+MODEL_ACQUIRE_TIMEOUT = 30  # 模型并发已满时的最长等待时间（秒）
+
+# 生成调度配置（每个模型路由独立调度，交互式请求优先，同优先级按用户轮询）
+MODEL_BATCH_ACQUIRE_TIMEOUT = 600  # 批量请求排队最长等待时间（秒）
+SCHEDULER_MAX_QUEUE = 64  # 每个模型路由最大排队数，超出后直接拒绝
+SCHEDULER_STARVATION_SECONDS = 30  # 批量请求排队超过该时间后提升优先级
+
+# 性能剖析配置
+PROFILE_TOKEN = None  # 设置后，请求头 X-Profile: <PROFILE_TOKEN> 触发单次请求剖析
+PROFILE_SAMPLE_RATE = 0.0  # 按比例随机剖析请求，0表示关闭
+PROFILE_FORMAT = "pstats"  # pstats（cProfile统计）或collapsed（折叠调用栈，用于火焰图），可由X-Profile-Format请求头覆盖
+PROFILE_DIR = "instance/profiles"
+SLOW_REQUEST_MS = 1000  # 慢请求日志阈值（毫秒），设为None关闭
+
+# 日志配置
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "json"  # json或text
+LOG_QUEUE_SIZE = 10000  # 日志队列容量，队列满时丢弃新日志而不阻塞请求线程
+LOG_RATE_LIMIT_WINDOW = 60  # 同一位置重复警告/错误日志的限流窗口（秒）
+LOG_RATE_LIMIT_BURST = 5  # 每个窗口内最多输出的条数
+
+# 响应压缩配置（brotli、zstd需分别安装brotli、zstandard包，未安装时自动跳过）
+COMPRESS_ENABLED = True
+COMPRESS_ALGORITHMS = ["br", "zstd", "gzip"]  # 服务端优先顺序
+COMPRESS_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+COMPRESS_MIN_SIZE = 500  # 小于该字节数的非流式响应不压缩
+
+# 聊天记录全文检索（SQLite FTS5，修改分词器后需执行 flask rebuild-search-index）
+SEARCH_ENABLED = True
+SEARCH_TOKENIZER = "trigram"  # trigram支持中文子串检索（SQLite>=3.34）；纯英文场景可用"unicode61"或"porter unicode61"
+SEARCH_MAX_CANDIDATES = 1000  # 只在当前用户最近的N条命中消息中按相关度排序
+
+# 增量预填充（登录用户的会话通过/api/generate携带上一轮的context，服务端只需计算新提问）
+# 首轮提问及可复用context的轮次使用/api/generate，其余轮次照常通过/api/chat发送历史；
+# 回复包含<think>思考过程时不保存context，因此只对不输出思考过程的模型有效
+INCREMENTAL_PREFILL = False
+INCREMENTAL_PREFILL_MAX_TOKENS = 8192  # context超过该长度时丢弃，之后的轮次通过/api/chat发送最近的历史
+
+# 流式输出合并（按时间窗口或字节数合并token后再写出，窗口随客户端消费速度自适应）
+STREAM_COALESCE = True
+STREAM_COALESCE_MS = 20  # 最小合并窗口（毫秒），首个token总是立即输出
+STREAM_COALESCE_MAX_MS = 200  # 客户端较慢时的最大合并窗口（毫秒）
+STREAM_FRAME_BYTES = 4096  # 单帧达到该字节数时立即输出
+STREAM_MAX_BUFFER_BYTES = 262144  # 每个连接的缓冲上限，超出时断开该客户端并停止生成
+
+# WebSocket聊天通道（/ws/chat，需安装flask-sock）
+WEBSOCKET_ENABLED = True
+WEBSOCKET_PING_INTERVAL = 25  # 协议层心跳间隔（秒）
+WEBSOCKET_MAX_INFLIGHT = 4  # 单个连接同时进行的对话数
+WEBSOCKET_ALLOWED_ORIGINS = []  # 额外允许的来源（如"https://chat.example.com"），默认只接受同源连接
+
+# 存活/就绪检查（/healthz、/readyz，结果由后台线程定期刷新）
+HEALTH_PROBE_INTERVAL = 5  # 检查间隔（秒）
+HEALTH_PROBE_TIMEOUT = 2  # 单项检查超时（秒）
+HEALTH_STALE_SECONDS = 30  # 检查结果超过该时间未刷新时视为未就绪
+HEALTH_QUEUE_THRESHOLD = 0.8  # 排队人数达到队列上限的该比例时视为未就绪
+HEALTH_REQUIRE_MODEL_LOADED = False  # Ollama空闲时会卸载模型，开启后空闲实例可能一直无法就绪
+
+# 密码哈希（注册与flask import-users共用，轮数每加1耗时翻倍）
+BCRYPT_LOG_ROUNDS = 12
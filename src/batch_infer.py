@@ -0,0 +1,323 @@
+"""离线批量推理：从JSONL文件读取提示词，并发调用模型并增量写出结果
+
+断点续跑机制：
+- 输出文件为追加写入的JSONL，每条结果记录输入行号（line）与请求ID（id）；同一行重试后以最后一条结果为准
+- 检查点文件记录"水位线"（行号小于水位线的输入均已处理过）、水位线之后已完成的行、结果为失败的行，
+  以及保存时输出文件的长度；恢复时只扫描该长度之后写出的结果，内存占用与输入规模无关
+- 失败的行（如模型服务不可用）默认在续跑时重新执行
+- 检查点同时记录各行的请求ID（水位线之前的部分只保存摘要），输入文件被修改或重新排序时拒绝续跑
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from src.dk_client import LocalLLMClient, split_reasoning
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CheckpointMismatchError(ValueError):
+    """输入或输出文件与检查点不一致"""
+
+
+def iter_jsonl(path: str) -> Iterator[tuple[int, Optional[dict]]]:
+    """逐行读取JSONL文件，返回(行号, 记录)；空行跳过，无效JSON返回None"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_no, None
+
+
+def count_records(path: str) -> int:
+    """流式统计非空行数（用于计算进度与ETA）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return sum(1 for line in f if line.strip())
+
+
+def record_id(record: Optional[dict], line_no: int, id_field: str) -> Any:
+    """结果中使用的请求ID（记录缺少ID字段时使用行号）"""
+    return (record if isinstance(record, dict) else {}).get(id_field, line_no)
+
+
+def _digest_item(line_no: int, request_id: Any) -> bytes:
+    return json.dumps([line_no, request_id], ensure_ascii=False, default=str).encode('utf-8') + b'\n'
+
+
+class Checkpoint:
+    """批量推理检查点（水位线 + 水位线之后已完成的行 + 失败的行）"""
+
+    def __init__(self, path: str, output_path: str):
+        self.path = path
+        self.output_path = output_path
+        self.watermark = 0
+        self.done_above: Dict[int, Any] = {}  # 行号 -> 请求ID（水位线之后已完成的行）
+        self.failed: Dict[int, Any] = {}  # 行号 -> 请求ID（最近一次结果为失败的行）
+        self.offset = 0  # 保存检查点时输出文件的长度
+        self._saved_digest: Optional[str] = None
+        self._digest = hashlib.sha256()  # 水位线之前各行(行号, 请求ID)的摘要
+        self._pending = deque()  # 已读取、尚未低于水位线的(行号, 请求ID)
+
+    def load(self):
+        """读取检查点，并从输出文件中恢复检查点之后写出的结果"""
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.watermark = data.get('watermark', 0)
+            self.offset = data.get('offset', 0)  # 旧版检查点没有该字段，需扫描整个输出文件
+            self.done_above = {line: request_id for line, request_id in data.get('done_above', [])}
+            self.failed = {line: request_id for line, request_id in data.get('failed', [])}
+            self._saved_digest = data.get('digest')
+        if not os.path.exists(self.output_path):
+            if self.offset:
+                raise CheckpointMismatchError(f"输出文件不存在：{self.output_path}")
+            return
+
+        self._truncate_partial_line()
+        if os.path.getsize(self.output_path) < self.offset:
+            raise CheckpointMismatchError(f"输出文件短于检查点记录的长度：{self.output_path}")
+        with open(self.output_path, 'rb') as f:
+            f.seek(self.offset)
+            for raw in f:
+                try:
+                    result = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(result, dict) and isinstance(result.get('line'), int):
+                    self.mark_done(result['line'], result.get('id'), result.get('status') == 'success')
+
+    def verify(self, input_path: str, id_field: str):
+        """按行号与请求ID核对输入文件，同时计算水位线之前的摘要
+
+        Raises:
+            CheckpointMismatchError: 输入文件在上次运行之后被修改或重新排序
+        """
+        last = max([self.watermark - 1, *self.done_above, *self.failed], default=-1)
+        digest = hashlib.sha256()
+        for line_no, record in iter_jsonl(input_path):
+            if line_no > last:
+                break
+            request_id = record_id(record, line_no, id_field)
+            if line_no < self.watermark:
+                digest.update(_digest_item(line_no, request_id))
+            expected = self.done_above.get(line_no, self.failed.get(line_no, _MISSING))
+            if expected is not _MISSING and expected != request_id:
+                raise CheckpointMismatchError(
+                    f"输入文件第{line_no + 1}行的请求ID与已有结果不一致（{expected!r} != {request_id!r}）"
+                )
+        if self._saved_digest is not None and digest.hexdigest() != self._saved_digest:
+            raise CheckpointMismatchError("输入文件在水位线之前的内容已被修改")
+        self._digest = digest
+
+    def _truncate_partial_line(self):
+        """截断崩溃时写了一半的最后一行，避免新结果拼接到损坏的行后面"""
+        with open(self.output_path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            position = size
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                index = f.read(step).rfind(b'\n')
+                if index >= 0:
+                    f.truncate(position + index + 1)
+                    return
+            f.truncate(0)
+
+    def is_done(self, line_no: int, retry_failed: bool = True) -> bool:
+        if line_no in self.failed:
+            return not retry_failed
+        return line_no < self.watermark or line_no in self.done_above
+
+    def observe(self, line_no: int, request_id: Any):
+        """记录主循环读取到的水位线之后的行（推进水位线时计入摘要）"""
+        self._pending.append((line_no, request_id))
+
+    def mark_done(self, line_no: int, request_id: Any, succeeded: bool):
+        if succeeded:
+            self.failed.pop(line_no, None)
+        else:
+            self.failed[line_no] = request_id
+        if line_no >= self.watermark:
+            self.done_above[line_no] = request_id
+
+    def advance(self, next_unfinished: int):
+        """推进水位线到第一个未完成的行号"""
+        self.watermark = max(self.watermark, next_unfinished)
+        while self._pending and self._pending[0][0] < self.watermark:
+            self._digest.update(_digest_item(*self._pending.popleft()))
+        self.done_above = {line: request_id for line, request_id in self.done_above.items()
+                           if line >= self.watermark}
+
+    def save(self):
+        """保存检查点（调用前需已刷新输出文件）"""
+        data = {
+            'watermark': self.watermark,
+            'offset': os.path.getsize(self.output_path) if os.path.exists(self.output_path) else 0,
+            'done_above': sorted(self.done_above.items()),
+            'failed': sorted(self.failed.items()),
+            'digest': self._digest.hexdigest()
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.offset = data['offset']
+
+
+def build_messages(record: dict, prompt_field: str) -> list[dict]:
+    """从输入记录构建对话消息（优先使用messages字段）"""
+    messages = record.get('messages')
+    if isinstance(messages, list):
+        return messages
+    prompt = record.get(prompt_field)
+    if not prompt or not isinstance(prompt, str):
+        raise ValueError(f"缺少提示词字段：{prompt_field}")
+    return [{"role": "user", "content": prompt}]
+
+
+def infer_one(client: LocalLLMClient, line_no: int, record: Optional[dict],
+              id_field: str, prompt_field: str) -> dict:
+    """执行单条推理，失败时返回错误结果"""
+    started = time.perf_counter()
+    result = {'id': record_id(record, line_no, id_field), 'line': line_no}
+    try:
+        if record is None:
+            raise ValueError("无效的JSON数据")
+        response = next(client.generate(messages=build_messages(record, prompt_field),
+                                        options=record.get('options') or {}))
+        result.update({
+            'status': 'success',
+            'response': split_reasoning(response.get('message', {}).get('content', ''))[1],
+            'model': response.get('model', client.config.model_name)
+        })
+    except Exception as e:
+        result.update({'status': 'error', 'message': str(e)})
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def run_batch_inference(
+        client: LocalLLMClient,
+        input_path: str,
+        output_path: str,
+        concurrency: int = 4,
+        id_field: str = 'id',
+        prompt_field: str = 'prompt',
+        checkpoint_every: int = 100,
+        retry_failed: bool = True,
+        progress: Optional[Callable[[dict], None]] = None,
+        progress_interval: float = 1.0
+) -> dict:
+    """执行离线批量推理
+
+    Args:
+        client: LLM客户端（各线程共享连接池）
+        input_path: 输入JSONL文件
+        output_path: 输出JSONL文件（追加写入）
+        concurrency: 最大并发请求数
+        checkpoint_every: 每完成多少条保存一次检查点
+        retry_failed: 续跑时是否重新执行此前失败的行
+        progress: 进度回调，参数为统计字典
+
+    Returns:
+        最终统计字典
+
+    Raises:
+        CheckpointMismatchError: 输入或输出文件与检查点不一致
+    """
+    if concurrency < 1:
+        raise ValueError("并发数必须大于0")
+    if checkpoint_every < 1:
+        raise ValueError("检查点间隔必须大于0")
+
+    checkpoint = Checkpoint(output_path + '.ckpt', output_path)
+    checkpoint.load()
+    checkpoint.verify(input_path, id_field)
+
+    total = count_records(input_path)
+    stats = {'total': total, 'skipped': 0, 'retried': 0, 'succeeded': 0, 'failed': 0,
+             'rate': 0.0, 'eta_seconds': None}
+    started = last_report = time.monotonic()
+
+    # 已提交但尚未完成的行号；水位线推进到其中最小值
+    in_flight = {}
+    max_in_flight = concurrency * 2
+
+    def report(force=False):
+        nonlocal last_report
+        now = time.monotonic()
+        if not progress or (not force and now - last_report < progress_interval):
+            return
+        last_report = now
+        finished = stats['succeeded'] + stats['failed']
+        stats['rate'] = finished / (now - started) if now > started else 0.0
+        remaining = total - stats['skipped'] - finished
+        stats['eta_seconds'] = remaining / stats['rate'] if stats['rate'] else None
+        progress(stats)
+
+    def drain(done_futures, out):
+        for future in done_futures:
+            line_no = in_flight.pop(future)
+            result = future.result()
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            succeeded = result['status'] == 'success'
+            checkpoint.mark_done(line_no, result['id'], succeeded)
+            stats['succeeded' if succeeded else 'failed'] += 1
+        out.flush()
+
+    with open(output_path, 'a', encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch-infer') as executor:
+        since_checkpoint = 0
+        next_line = 0
+        for line_no, record in iter_jsonl(input_path):
+            next_line = line_no + 1
+            request_id = record_id(record, line_no, id_field)
+            if line_no >= checkpoint.watermark:
+                checkpoint.observe(line_no, request_id)
+            if checkpoint.is_done(line_no, retry_failed):
+                stats['skipped'] += 1
+                continue
+            if line_no in checkpoint.failed:
+                stats['retried'] += 1
+
+            while len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                drain(done, out)
+                since_checkpoint += len(done)
+                report()
+
+            future = executor.submit(infer_one, client, line_no, record, id_field, prompt_field)
+            in_flight[future] = line_no
+
+            if since_checkpoint >= checkpoint_every:
+                checkpoint.advance(min(in_flight.values()))
+                checkpoint.save()
+                since_checkpoint = 0
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            drain(done, out)
+            report()
+
+        checkpoint.advance(next_line)
+        checkpoint.save()
+
+    report(force=True)
+    return stats
@@ -1,7 +1,7 @@
 import os
 # import readline  # 提供输入历史支持（Unix系统）
 from typing import List, Dict
-from dk_client import LocalLLMClient, LocalLLMConfig  # 引用之前定义的客户端
+from dk_client import LocalLLMClient, LocalLLMConfig, split_reasoning  # 引用之前定义的客户端
 
 
 class ChatSession:
@@ -90,9 +90,12 @@ class ChatSession:
                     # temperature=0.3  # 降低随机性以获得更稳定输出
                 ))
 
-                # 解析并显示响应
-                reply = response['message']['content']
+                # 解析并显示响应（思考过程只显示，不写入历史，避免每轮重复发送）
+                thinking, reply = split_reasoning(response['message']['content'])
+                if thinking:
+                    print(f"\033[90m[思考]\n{thinking}\033[0m")
                 print(f"\033[34m[DeepSeek]\033[0m\n{reply}\n")
+                self.history.append({"role": "assistant", "content": reply})
 
             except KeyboardInterrupt:
                 print("\n\033[33m检测到中断，输入 'exit' 退出程序\033[0m")
@@ -0,0 +1,142 @@
+"""API响应压缩（gzip，可选brotli/zstd）
+
+- 根据Accept-Encoding协商编码，按COMPRESS_ALGORITHMS的顺序优先选择
+- 普通响应：正文不小于COMPRESS_MIN_SIZE时整体压缩
+- 流式响应：每个数据块（一批token）压缩后立即flush，客户端可以立刻解压，首token延迟不受影响
+"""
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import request
+from werkzeug.wsgi import ClosingIterator
+
+try:  # 可选依赖
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:  # 可选依赖
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+DEFAULT_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/javascript',
+}
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip格式
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.process(data)
+        return output + self._compressor.flush() if flush else output
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else output
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+COMPRESSORS = {'gzip': GzipCompressor}
+if brotli is not None:
+    COMPRESSORS['br'] = BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS['zstd'] = ZstdCompressor
+
+
+def negotiate_encoding(accept_encoding, preferred: Iterable[str]) -> Optional[str]:
+    """按服务端优先顺序选择客户端接受（q>0）且本地可用的编码"""
+    for encoding in preferred:
+        if encoding in COMPRESSORS and accept_encoding[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress_body(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """整体压缩响应正文"""
+    compressor = COMPRESSORS[encoding](DEFAULT_LEVELS[encoding] if level is None else level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks: Iterator[bytes], encoding: str, level: Optional[int] = None) -> Iterator[bytes]:
+    """逐块压缩流式响应，每块都flush以保证客户端能立即解码"""
+    compressor = COMPRESSORS[encoding](DEFAULT_LEVELS[encoding] if level is None else level)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk, flush=True)
+    tail = compressor.finish()
+    if tail:
+        yield tail
+
+
+def init_compression(app):
+    """注册响应压缩钩子（COMPRESS_ENABLED为False时不启用）"""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    preferred = app.config.get('COMPRESS_ALGORITHMS', ['br', 'zstd', 'gzip'])
+    levels = {**DEFAULT_LEVELS, **app.config.get('COMPRESS_LEVELS', {})}
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or request.method == 'HEAD'):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request.accept_encodings, preferred)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            original = response.response
+            response.response = ClosingIterator(
+                compress_stream(response.iter_encoded(), encoding, levels[encoding]),
+                getattr(original, 'close', None)
+            )
+            response.headers.pop('Content-Length', None)
+        else:
+            if response.direct_passthrough:
+                return response
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(compress_body(data, encoding, levels[encoding]))
+
+        response.headers['Content-Encoding'] = encoding
+        return response
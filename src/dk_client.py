@@ -1,16 +1,24 @@
 import json
 import logging
+import threading
+import zlib
+from array import array
 from typing import Dict, Any, Generator, Optional
+from urllib.parse import urlsplit, urlunsplit
 from pydantic import BaseModel, field_validator, ValidationError
 import requests
 from requests.exceptions import RequestException
 
-# 配置结构化日志（优化日志格式）
-logging.basicConfig(
-    format='%(asctime)s - %(levelname)s - %(name)s - [%(filename)s:%(lineno)d] - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger("__name__")
+logger = logging.getLogger(__name__)
+
+
+def derive_ollama_url(endpoint: str, path: str) -> str:
+    """根据Ollama服务端点推导同一服务下的其他API地址
+
+    例：http://localhost:11434/api/chat -> http://localhost:11434/api/embeddings
+    """
+    parts = urlsplit(endpoint)
+    return urlunsplit((parts.scheme, parts.netloc, path, '', ''))
 
 
 class LocalLLMConfig(BaseModel):
@@ -60,6 +68,10 @@ class LocalLLMClient:
         """
         self.config = config or LocalLLMConfig()  # 避免使用可变默认值
         self.session = self._create_session()
+        # 正在请求的线程 -> 响应对象（用于从其他线程中断流式读取，见interrupt）
+        self._streams: Dict[int, Optional[requests.Response]] = {}
+        self._interrupted = set()
+        self._streams_lock = threading.Lock()
 
     def _create_session(self) -> requests.Session:
         """创建带连接池和重试机制的HTTP会话"""
@@ -102,32 +114,117 @@ class LocalLLMClient:
             **kwargs  # 允许覆盖或添加额外参数
         }
 
-        logger.debug(f"请求端点：{self.config.endpoint}")
+        yield from self._post(self.config.endpoint, payload, stream)
+
+    def generate_incremental(
+            self,
+            prompt: str,
+            context: Optional[list[int]] = None,
+            stream: bool = False,
+            **kwargs
+    ) -> Generator[Dict[str, Any], None, None]:
+        """基于上下文token的增量生成（Ollama /api/generate）
+
+        /api/chat每轮都要发送完整对话，服务端重新分词并计算整段提示词；
+        /api/generate在最后一个响应块中返回context（截至本轮回答的token序列），
+        下一轮只发送新的提问并带上context，服务端可复用已计算的前缀，提示词计算量只与新提问有关。
+
+        Args:
+            prompt: 本轮提问（/api/generate按单轮提问套用模型模板，无context时只适用于首轮提问）
+            context: 上一轮返回的context，为None时从头计算
+
+        Yields:
+            与generate相同格式的响应块（response字段转换为message.content），
+            最后一个响应块（done为True）附带context
+        """
+        payload = {
+            "model": self.config.model_name,
+            "prompt": prompt,
+            "stream": stream,
+            **kwargs
+        }
+        if context:
+            payload["context"] = context
+
+        url = derive_ollama_url(self.config.endpoint, '/api/generate')
+        for chunk in self._post(url, payload, stream, chunk_check=lambda c: "response" in c):
+            message = {"role": "assistant", "content": chunk.pop("response")}
+            if chunk.get("thinking"):
+                message["thinking"] = chunk.pop("thinking")
+            yield {**chunk, "message": message}
+
+    def _post(self, url: str, payload: Dict[str, Any], stream: bool, chunk_check=None):
+        """发送请求并按模式解析响应"""
+        logger.debug(f"请求端点：{url}")
         logger.debug(f"请求参数：{json.dumps(payload, indent=2, ensure_ascii=False)}")
 
+        thread_id = threading.get_ident()
+        with self._streams_lock:
+            self._streams[thread_id] = None
         try:
             with self.session.post(
-                    url=self.config.endpoint,
+                    url=url,
                     json=payload,
                     timeout=self.config.timeout,
                     stream=stream  # 流式模式需要保持连接
             ) as response:
                 response.raise_for_status()  # 触发HTTP错误状态码异常
+                with self._streams_lock:
+                    if thread_id in self._interrupted:
+                        return
+                    self._streams[thread_id] = response
 
                 if stream:
-                    yield from self._handle_stream(response)
+                    yield from self._handle_stream(response, chunk_check)
                 else:
-                    yield self._handle_standard(response)
+                    yield self._handle_standard(response, chunk_check)
 
         except RequestException as re:
             error_msg = f"请求失败：{str(re)}"
-            logger.error(error_msg, exc_info=True)
+            if not self._is_interrupted(thread_id):
+                logger.error(error_msg, exc_info=True)
             raise APIConnectionError(error_msg) from re
         except ValidationError as ve:
             logger.error("配置验证失败", exc_info=True)
             raise
+        finally:
+            with self._streams_lock:
+                self._streams.pop(thread_id, None)
+                self._interrupted.discard(thread_id)
+
+    def interrupt(self, thread_id: int) -> bool:
+        """中断指定线程中正在进行的请求（关闭连接的读端，阻塞中的读取立即返回）
+
+        用于在其他线程中停止流式读取，读取线程随后正常退出，中断引起的连接错误不记录日志。
+
+        Returns:
+            该线程是否有正在进行的请求
+        """
+        with self._streams_lock:
+            if thread_id not in self._streams:
+                return False
+            self._interrupted.add(thread_id)
+            response = self._streams[thread_id]
+        if response is not None:
+            shutdown = getattr(response.raw, 'shutdown', None)  # urllib3>=2.3
+            try:
+                if shutdown is not None:
+                    shutdown()
+                else:
+                    response.close()
+            except OSError:
+                pass
+        return True
 
-    def _handle_standard(self, response: requests.Response) -> Dict[str, Any]:
+    def _is_interrupted(self, thread_id: Optional[int] = None) -> bool:
+        with self._streams_lock:
+            return (thread_id or threading.get_ident()) in self._interrupted
+
+    @staticmethod
+    def _is_chat_chunk(data: Dict[str, Any]) -> bool:
+        return "message" in data and "content" in data["message"]
+
+    def _handle_standard(self, response: requests.Response, chunk_check=None) -> Dict[str, Any]:
         """处理标准（非流式）响应
         Returns:
             解析后的JSON响应字典
@@ -139,7 +236,7 @@ class LocalLLMClient:
         try:
             data = response.json()
             # 验证必要字段存在（增强健壮性）
-            if "message" not in data or "content" not in data["message"]:
+            if not (chunk_check or self._is_chat_chunk)(data):
                 logger.error(f"无效响应格式：{json.dumps(data, indent=2)}")
                 raise ValueError("响应缺少必要字段")
             return data
@@ -147,7 +244,7 @@ class LocalLLMClient:
             logger.error(f"JSON解析失败，原始响应：{response.text[:200]}...")
             raise
 
-    def _handle_stream(self, response: requests.Response) -> Generator[Dict[str, Any], None, None]:
+    def _handle_stream(self, response: requests.Response, chunk_check=None) -> Generator[Dict[str, Any], None, None]:
         """处理流式响应
         Yields:
             每个数据块对应的字典
@@ -163,7 +260,7 @@ class LocalLLMClient:
                         line = raw_line.decode('utf-8').strip()
                         chunk = json.loads(line)
                         # 验证数据块有效性
-                        if "message" in chunk and "content" in chunk["message"]:
+                        if (chunk_check or self._is_chat_chunk)(chunk):
                             yield chunk
                         else:
                             logger.debug(f"收到元数据块：{chunk}")
@@ -171,10 +268,119 @@ class LocalLLMClient:
                         logger.warning(f"无效JSON数据：{line}")
         except requests.exceptions.ChunkedEncodingError as ce:
             error_msg = f"流传输中断：{str(ce)}"
-            logger.error(error_msg)
+            if not self._is_interrupted():
+                logger.error(error_msg)
             raise StreamInterruptionError(error_msg) from ce
 
 
+class ReasoningSplitter:
+    """推理模型输出处理器（分离<think>思考过程与最终回答）
+
+    deepseek-r1等推理模型会在回答前输出<think>…</think>思考块。
+    流式模式下标签可能被拆分到多个数据块中，因此需要缓存可能构成标签前缀的尾部文本。
+
+    用法：
+        splitter = ReasoningSplitter()
+        for chunk in client.generate(messages, stream=True):
+            for channel, text in splitter.feed_chunk(chunk):
+                ...  # channel为"thinking"或"answer"
+        for channel, text in splitter.flush():
+            ...
+    """
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_thinking = False
+        self._answer_started = False
+
+    def feed_chunk(self, chunk: Dict[str, Any]) -> list[tuple[str, str]]:
+        """处理一个Ollama响应块（兼容单独返回message.thinking字段的新版接口）"""
+        message = chunk.get("message", {})
+        parts = []
+        if message.get("thinking"):
+            parts.append(("thinking", message["thinking"]))
+        parts.extend(self.feed(message.get("content", "")))
+        return parts
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        """输入一段文本，返回可确定归属的(通道, 文本)列表"""
+        self._buffer += text
+        parts = []
+        while self._buffer:
+            tag = self.CLOSE_TAG if self._in_thinking else self.OPEN_TAG
+            index = self._buffer.find(tag)
+            if index >= 0:
+                self._emit(parts, self._buffer[:index])
+                self._buffer = self._buffer[index + len(tag):]
+                self._in_thinking = not self._in_thinking
+                continue
+            # 保留可能是标签前缀的尾部，等待后续数据块
+            keep = self._partial_tag_length(tag)
+            self._emit(parts, self._buffer[:len(self._buffer) - keep])
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            break
+        return parts
+
+    def flush(self) -> list[tuple[str, str]]:
+        """输出结束时调用，返回剩余缓存内容"""
+        parts = []
+        self._emit(parts, self._buffer)
+        self._buffer = ""
+        return parts
+
+    def _partial_tag_length(self, tag: str) -> int:
+        for length in range(min(len(tag) - 1, len(self._buffer)), 0, -1):
+            if self._buffer.endswith(tag[:length]):
+                return length
+        return 0
+
+    def _emit(self, parts: list, text: str):
+        if not text:
+            return
+        if self._in_thinking:
+            parts.append(("thinking", text))
+            return
+        if not self._answer_started:
+            # 去除思考块与回答之间的空白
+            text = text.lstrip()
+            if not text:
+                return
+            self._answer_started = True
+        parts.append(("answer", text))
+
+
+def split_reasoning(text: str) -> tuple[str, str]:
+    """将完整输出拆分为(思考过程, 回答)"""
+    splitter = ReasoningSplitter()
+    parts = splitter.feed(text) + splitter.flush()
+    thinking = "".join(t for channel, t in parts if channel == "thinking")
+    answer = "".join(t for channel, t in parts if channel == "answer")
+    return thinking.strip(), answer
+
+
+def strip_reasoning(messages: list[dict]) -> list[dict]:
+    """去除对话历史中助手消息的思考过程，避免每轮重复发送给模型"""
+    cleaned = []
+    for message in messages:
+        if message.get("role") == "assistant" and ReasoningSplitter.OPEN_TAG in message.get("content", ""):
+            message = {**message, "content": split_reasoning(message["content"])[1]}
+        cleaned.append(message)
+    return cleaned
+
+
+def pack_context(context: list[int]) -> bytes:
+    """压缩context token序列（uint32数组 + zlib）用于持久化"""
+    return zlib.compress(array('I', context).tobytes())
+
+
+def unpack_context(data: bytes) -> list[int]:
+    tokens = array('I')
+    tokens.frombytes(zlib.decompress(data))
+    return tokens.tolist()
+
+
 class APIConnectionError(Exception):
     """自定义API连接异常（用于网络/服务器错误）"""
 
@@ -191,6 +397,11 @@ class StreamInterruptionError(Exception):
 
 # 测试用例
 if __name__ == "__main__":
+    logging.basicConfig(
+        format='%(asctime)s - %(levelname)s - %(name)s - [%(filename)s:%(lineno)d] - %(message)s',
+        level=logging.INFO
+    )
+
     # 测试代码
     try:
         # 初始化配置（示例使用自定义参数）
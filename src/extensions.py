@@ -6,11 +6,17 @@ from flask_migrate import Migrate
 from flask_mail import Mail
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from src.semantic_cache import SemanticCache
+from src.model_router import ModelRouter
+from src.health import HealthProber
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 migrate = Migrate()
 mail = Mail()
+semantic_cache = SemanticCache()
+model_router = ModelRouter()
+health_prober = HealthProber()
 
 limiter = Limiter(key_func=get_remote_address, storage_uri="redis://localhost:6379/0")
 
@@ -21,3 +27,6 @@ def init_ext(app):
     bcrypt.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
+    semantic_cache.init_app(app)
+    model_router.init_app(app)
+    health_prober.init_app(app)
@@ -0,0 +1,197 @@
+"""存活与就绪检查（/healthz、/readyz）
+
+后台线程按HEALTH_PROBE_INTERVAL定期检查数据库（SELECT 1）和各Ollama服务端点（/api/tags、/api/ps），
+结果缓存在内存中。探针请求只读取缓存，不访问数据库和模型服务。
+
+- /healthz：进程存活即返回200（不依赖外部服务，避免依赖故障导致进程被反复重启）
+- /readyz：以下条件均满足时返回200，否则返回503
+  - 最近一次检查在HEALTH_STALE_SECONDS之内
+  - 数据库可用，所有模型服务端点可访问，各路由使用的模型均已在对应端点拉取
+    （HEALTH_REQUIRE_MODEL_LOADED为True时还需已加载；未配置MODEL_ROUTES时即DEFAULT_MODEL）
+  - 各路由排队人数低于队列上限的HEALTH_QUEUE_THRESHOLD（在开始拒绝请求之前摘除流量）
+  - 进程未处于停止中（见mark_draining）
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+
+from src.dk_client import derive_ollama_url
+
+logger = logging.getLogger(__name__)
+
+health_bp = Blueprint('health', __name__)
+
+
+def normalize_model_name(name: str) -> str:
+    """Ollama省略标签时默认为latest"""
+    return name if ':' in name else f"{name}:latest"
+
+
+class HealthProber:
+    """后台健康检查线程（按进程号判断，fork后的子进程中调用start会重新创建线程）"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 5.0
+        self.timeout = 2.0
+        self.stale_seconds = 30.0
+        self.queue_threshold = 0.8
+        self.require_loaded = False
+        self.default_endpoint = None
+        self.default_model = None
+        self._session = None
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._draining = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['health_prober'] = self
+        self.app = app
+        self.interval = app.config.get('HEALTH_PROBE_INTERVAL', 5.0)
+        self.timeout = app.config.get('HEALTH_PROBE_TIMEOUT', 2.0)
+        self.stale_seconds = app.config.get('HEALTH_STALE_SECONDS', 30.0)
+        self.queue_threshold = app.config.get('HEALTH_QUEUE_THRESHOLD', 0.8)
+        self.require_loaded = app.config.get('HEALTH_REQUIRE_MODEL_LOADED', False)
+        self.default_endpoint = app.config.get('DEFAULT_ENDPOINT', 'http://localhost:11434/api/chat').rstrip('/')
+        self.default_model = normalize_model_name(app.config.get('DEFAULT_MODEL', 'deepseek-r1:1.5b'))
+        self._session = requests.Session()
+        self._snapshot = None
+        self._draining = False
+
+    def start(self):
+        """启动后台检查线程（当前进程中已在运行时不做任何操作）"""
+        with self._lock:
+            if self.app is None or (self._pid == os.getpid() and self._thread.is_alive()):
+                return
+            self._stop.clear()
+            self._draining = False
+            self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self._stop.set()
+
+    def mark_draining(self):
+        """进程开始停止时调用，此后就绪检查返回503"""
+        self._draining = True
+
+    def _run(self):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:  # 检查线程不能退出
+                logger.error(f"健康检查失败: {str(e)}", exc_info=True)
+            if self._stop.wait(self.interval):
+                return
+
+    def probe(self) -> Dict[str, Any]:
+        """执行一次全部检查并更新缓存"""
+        from src.extensions import model_router
+
+        backends = model_router.backends() or {self.default_endpoint: {self.default_model}}
+        snapshot = {
+            'checked_at': time.time(),
+            'database': self._check_database(),
+            'backends': {endpoint: self._check_backend(endpoint, models) for endpoint, models in backends.items()}
+        }
+        self._snapshot = snapshot  # 整体替换，读取方无需加锁
+        return snapshot
+
+    def _check_database(self) -> Dict[str, Any]:
+        from src.extensions import db
+
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with db.engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+            return {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+
+    def _check_backend(self, endpoint: str, models: set) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            tags = self._session.get(derive_ollama_url(endpoint, '/api/tags'), timeout=self.timeout)
+            tags.raise_for_status()
+            loaded = self._session.get(derive_ollama_url(endpoint, '/api/ps'), timeout=self.timeout)
+            loaded.raise_for_status()
+            installed = {normalize_model_name(m.get('name', '')) for m in tags.json().get('models', [])}
+            running = {normalize_model_name(m.get('name', '')) for m in loaded.json().get('models', [])}
+        except (requests.RequestException, ValueError) as e:
+            return {'ok': False, 'error': str(e)}
+
+        return {
+            'ok': True,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+            'models': {
+                model: {'installed': normalize_model_name(model) in installed,
+                        'loaded': normalize_model_name(model) in running}
+                for model in sorted(models)
+            }
+        }
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        return self._snapshot
+
+    def readiness(self) -> tuple[bool, list[str]]:
+        """根据缓存结果判断是否就绪，返回(是否就绪, 未就绪原因)"""
+        from src.extensions import model_router
+
+        reasons = []
+        if self._draining:
+            reasons.append('draining')
+        snapshot = self._snapshot
+        if snapshot is None:
+            reasons.append('not_probed')
+        else:
+            if time.time() - snapshot['checked_at'] > self.stale_seconds:
+                reasons.append('stale')
+            if not snapshot['database']['ok']:
+                reasons.append('database')
+            for endpoint, backend in snapshot['backends'].items():
+                if not backend['ok']:
+                    reasons.append(f"backend:{endpoint}")
+                    continue
+                # 检查的模型即各路由实际使用的模型（见probe），不要求路由之外的DEFAULT_MODEL
+                for name, model in backend['models'].items():
+                    if not model['installed']:
+                        reasons.append(f"model_missing:{name}")
+                    elif self.require_loaded and not model['loaded']:
+                        reasons.append(f"model_not_loaded:{name}")
+        if model_router.queue_pressure() >= self.queue_threshold:
+            reasons.append('saturated')
+        return not reasons, reasons
+
+
+@health_bp.route('/healthz')
+def healthz():
+    """存活检查"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+
+@health_bp.route('/readyz')
+def readyz():
+    """就绪检查（只读取后台检查的缓存结果）"""
+    from src.extensions import health_prober, model_router
+
+    health_prober.start()  # fork后的子进程中首次访问时启动检查线程
+    ready, reasons = health_prober.readiness()
+    return jsonify({
+        'status': 'ready' if ready else 'unavailable',
+        'reasons': reasons,
+        'queue_pressure': round(model_router.queue_pressure(), 2),
+        'checks': health_prober.snapshot()
+    }), 200 if ready else 503
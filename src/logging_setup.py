@@ -0,0 +1,181 @@
+"""集中式日志配置
+
+- 请求线程只把日志记录放入内存队列（队列满时丢弃并计数，绝不阻塞），由后台监听线程格式化并输出
+- 异常堆栈的格式化也在监听线程中完成
+- JSON结构化输出，附带请求ID（取自X-Request-ID请求头或自动生成，并写回响应头）
+- 同一代码位置重复出现的WARNING及以上日志按时间窗口限流，恢复输出时附带被抑制的条数
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from flask import g, has_request_context, request
+
+# LogRecord的标准属性，其余属性视为通过extra传入的结构化字段
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id',
+                                                                               'suppressed'}
+
+_queue_handler: Optional['NonBlockingQueueHandler'] = None
+_output_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+_listener_pid: Optional[int] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """为日志记录附加当前请求ID（在调用线程中执行）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id', '-') if has_request_context() else '-'
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """按代码位置限流重复的警告/错误日志
+
+    每个(logger, 文件, 行号, 级别)在window秒内最多输出burst条，
+    窗口结束后的第一条日志附带suppressed字段记录期间被丢弃的条数。
+    """
+
+    def __init__(self, window: float = 60.0, burst: int = 5, min_level: int = logging.WARNING):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.min_level = min_level
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.min_level:
+            return True
+        key = (record.name, record.pathname, record.lineno, record.levelno)
+        now = time.monotonic()
+        with self._lock:
+            started, count, suppressed = self._buckets.get(key, (now, 0, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            if count >= self.burst:
+                self._buckets[key] = (started, count, suppressed + 1)
+                return False
+            self._buckets[key] = (started, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """非阻塞队列处理器
+
+    与标准QueueHandler不同，prepare阶段不格式化消息和异常堆栈（监听线程在同一进程内，
+    可以直接使用exc_info），队列满时直接丢弃。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON结构化日志格式"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'location': f"{record.filename}:{record.lineno}",
+            'thread': record.threadName
+        }
+        if getattr(record, 'suppressed', 0):
+            data['suppressed'] = record.suppressed
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - [%(filename)s:%(lineno)d] - [%(request_id)s] - %(message)s'
+
+
+def start_listener():
+    """启动后台日志监听线程（fork后的子进程中调用会重新创建线程）"""
+    global _listener, _listener_pid
+    if _queue_handler is None or _listener_pid == os.getpid():
+        return
+    if _listener_pid is not None:
+        # fork后的子进程：父进程的监听线程可能在fork时持有队列内部的锁，换用新队列
+        _queue_handler.queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _listener = QueueListener(_queue_handler.queue, _output_handler, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def stop_listener():
+    """停止监听线程并输出队列中剩余的日志"""
+    global _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        _listener_pid = None
+
+
+def setup_logging(app):
+    """配置根日志器：请求线程 -> 内存队列 -> 后台监听线程 -> 输出"""
+    global _queue_handler, _output_handler
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = (request.headers.get('X-Request-ID') or uuid.uuid4().hex)[:128]
+
+    @app.after_request
+    def expose_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    root = logging.getLogger()
+    root.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
+    if _queue_handler is not None:
+        return
+
+    _output_handler = logging.StreamHandler()
+    if app.config.get('LOG_FORMAT', 'json') == 'json':
+        _output_handler.setFormatter(JsonFormatter())
+    else:
+        _output_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=app.config.get('LOG_QUEUE_SIZE', 10000)))
+    _queue_handler.addFilter(RateLimitFilter(
+        window=app.config.get('LOG_RATE_LIMIT_WINDOW', 60),
+        burst=app.config.get('LOG_RATE_LIMIT_BURST', 5)
+    ))
+    _queue_handler.addFilter(RequestIdFilter())
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+
+    start_listener()
+    atexit.register(stop_listener)
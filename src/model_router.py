@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+
+from src.dk_client import LocalLLMClient, LocalLLMConfig
+from src.scheduler import (FairScheduler, SchedulerFullError, SchedulerTimeoutError,
+                           PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRoute(BaseModel):
+    """模型路由配置
+
+    属性：
+    model_name: Ollama模型名称
+    endpoint: 服务端点，为空时使用DEFAULT_ENDPOINT
+    max_concurrency: 该模型允许的最大并发生成数
+    temperature: 生成温度，为空时使用DEFAULT_TEMPERATURE
+    """
+    model_name: str
+    endpoint: Optional[str] = None
+    max_concurrency: int = 4
+    temperature: Optional[float] = None
+
+
+class RoutingRule(BaseModel):
+    """路由规则（所有已设置的条件均满足时命中，按配置顺序匹配）
+
+    属性：
+    route: 命中后使用的路由名称
+    mode: 请求体中的mode字段
+    tiers: 用户等级列表
+    min_prompt_chars / max_prompt_chars: 提示词长度范围（字符数，闭区间）
+    """
+    route: str
+    mode: Optional[str] = None
+    tiers: Optional[list[str]] = None
+    min_prompt_chars: Optional[int] = None
+    max_prompt_chars: Optional[int] = None
+
+    def matches(self, prompt_chars: int, mode: Optional[str], tier: Optional[str]) -> bool:
+        if self.mode is not None and mode != self.mode:
+            return False
+        if self.tiers is not None and tier not in self.tiers:
+            return False
+        if self.min_prompt_chars is not None and prompt_chars < self.min_prompt_chars:
+            return False
+        if self.max_prompt_chars is not None and prompt_chars > self.max_prompt_chars:
+            return False
+        return True
+
+
+class RouteBusyError(Exception):
+    """模型并发已满且排队超时或队列已满"""
+
+    def __init__(self, route: str):
+        self.route = route
+        super().__init__(f"[模型繁忙] 路由{route}并发已满")
+
+
+class ModelRouter:
+    """按提示词长度、用户等级或显式mode在多个模型之间路由请求
+
+    每个路由拥有独立的客户端（连接池）和公平调度器（并发上限），并统计请求量、拒绝数和耗时。
+    未配置MODEL_ROUTES时只有一个使用DEFAULT_MODEL的default路由。
+    """
+
+    def __init__(self, app=None):
+        self.routes: Dict[str, ModelRoute] = {}
+        self.rules: list[RoutingRule] = []
+        self.default_route = 'default'
+        self.acquire_timeouts = {PRIORITY_INTERACTIVE: 30.0, PRIORITY_BATCH: 600.0}
+        self._clients: Dict[str, LocalLLMClient] = {}
+        self._schedulers: Dict[str, FairScheduler] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['model_router'] = self
+        routes = app.config.get('MODEL_ROUTES') or {
+            'default': {'model_name': app.config.get('DEFAULT_MODEL', 'deepseek-r1:1.5b')}
+        }
+        self.routes = {name: ModelRoute(**options) for name, options in routes.items()}
+        self.rules = [RoutingRule(**rule) for rule in app.config.get('MODEL_ROUTING_RULES', [])]
+        self.default_route = app.config.get('MODEL_DEFAULT_ROUTE') or next(iter(self.routes))
+        self.acquire_timeouts = {
+            PRIORITY_INTERACTIVE: app.config.get('MODEL_ACQUIRE_TIMEOUT', 30.0),
+            PRIORITY_BATCH: app.config.get('MODEL_BATCH_ACQUIRE_TIMEOUT', 600.0)
+        }
+
+        unknown = {rule.route for rule in self.rules} - set(self.routes)
+        if self.default_route not in self.routes or unknown:
+            raise ValueError(f"路由规则引用了未定义的路由：{unknown or {self.default_route}}")
+
+        self._clients = {}
+        self._schedulers = {}
+        self._stats = {}
+        for name, route in self.routes.items():
+            self._clients[name] = LocalLLMClient(LocalLLMConfig(
+                endpoint=route.endpoint or app.config.get('DEFAULT_ENDPOINT', 'http://localhost:11434/api/chat'),
+                model_name=route.model_name,
+                temperature=route.temperature if route.temperature is not None
+                else app.config.get('DEFAULT_TEMPERATURE', 0.7)
+            ))
+            self._schedulers[name] = FairScheduler(
+                capacity=route.max_concurrency,
+                max_queue=app.config.get('SCHEDULER_MAX_QUEUE', 64),
+                starvation_seconds=app.config.get('SCHEDULER_STARVATION_SECONDS', 30.0)
+            )
+            self._stats[name] = {'selected': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+                                 'in_flight': 0, 'total_ms': 0.0}
+
+    def select(self, prompt: str, mode: Optional[str] = None, tier: Optional[str] = None) -> str:
+        """选择路由：mode与路由同名时直接使用，否则按规则顺序匹配，均不匹配时使用默认路由
+
+        Raises:
+            ValueError: mode或tier不是字符串
+        """
+        for name, value in (('mode', mode), ('tier', tier)):
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{name}必须为字符串")
+        if mode in self.routes:
+            route = mode
+        else:
+            prompt_chars = len(prompt)
+            route = next((rule.route for rule in self.rules if rule.matches(prompt_chars, mode, tier)),
+                         self.default_route)
+        with self._lock:
+            self._stats[route]['selected'] += 1
+        return route
+
+    def client(self, route: str) -> LocalLLMClient:
+        return self._clients[route]
+
+    @contextmanager
+    def acquire(self, route: str, user: str = 'anonymous', priority: str = PRIORITY_INTERACTIVE,
+                timeout: Optional[float] = None):
+        """通过公平调度器占用路由的一个并发名额
+
+        Args:
+            user: 用户标识，同一优先级内按用户轮询
+            priority: 优先级类别（interactive/batch）
+            timeout: 排队超时时间，默认按优先级读取配置
+
+        Raises:
+            RouteBusyError: 排队超时或队列已满
+        """
+        if timeout is None:
+            timeout = self.acquire_timeouts[priority]
+        stats = self._stats[route]
+        scheduler = self._schedulers[route]
+        try:
+            scheduler.wait_for_slot(str(user), priority, timeout)
+        except (SchedulerTimeoutError, SchedulerFullError) as e:
+            with self._lock:
+                stats['rejected'] += 1
+            logger.warning(f"路由{route}并发已满，请求被拒绝：{str(e)}")
+            raise RouteBusyError(route) from e
+
+        with self._lock:
+            stats['in_flight'] += 1
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield self._clients[route]
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            scheduler.release()
+            with self._lock:
+                stats['in_flight'] -= 1
+                stats['failed' if failed else 'completed'] += 1
+                stats['total_ms'] += (time.perf_counter() - started) * 1000
+
+    @property
+    def saturated(self) -> bool:
+        """任一路由排队已满"""
+        return any(scheduler.saturated for scheduler in self._schedulers.values())
+
+    def queue_pressure(self) -> float:
+        """各路由排队人数占队列上限比例的最大值（未限制队列长度时为0）"""
+        return max((scheduler.queued / scheduler.max_queue
+                    for scheduler in self._schedulers.values() if scheduler.max_queue), default=0.0)
+
+    def backends(self) -> Dict[str, set]:
+        """各Ollama服务端点及其承载的模型"""
+        result = {}
+        for name, client in self._clients.items():
+            result.setdefault(client.config.endpoint, set()).add(client.config.model_name)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """导出各路由统计数据"""
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                finished = stats['completed'] + stats['failed']
+                result[name] = {
+                    'model': self.routes[name].model_name,
+                    'max_concurrency': self.routes[name].max_concurrency,
+                    **{key: value for key, value in stats.items() if key != 'total_ms'},
+                    'avg_ms': round(stats['total_ms'] / finished, 1) if finished else None,
+                    'queue': self._schedulers[name].stats()
+                }
+            return result
@@ -1,4 +1,18 @@
+import zlib
+from datetime import datetime, timezone
+
+from sqlalchemy.schema import CreateColumn
+
+from src.dk_client import pack_context, unpack_context
 from src.extensions import db, bcrypt
+from src.profiling import phase, PHASE_PASSWORD_HASH
+
+# 超过该字节数的消息正文压缩存储
+MESSAGE_COMPRESS_THRESHOLD = 512
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
 
 
 # 用户模型
@@ -7,10 +21,114 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(120), nullable=False)
+    tier = db.Column(db.String(20), nullable=False, default='free', server_default='free')  # 用户等级，用于模型路由
 
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        with phase(PHASE_PASSWORD_HASH):
+            self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        with phase(PHASE_PASSWORD_HASH):
+            return bcrypt.check_password_hash(self.password_hash, password)
+
+
+# 会话模型
+class Conversation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    title = db.Column(db.String(200), nullable=False, default='新对话')
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    # 增量预填充状态：模型返回的context token序列（压缩存储）、对应模型及生成时的消息数
+    llm_context = db.Column(db.LargeBinary, nullable=True)
+    llm_context_model = db.Column(db.String(100), nullable=True)
+    llm_context_messages = db.Column(db.Integer, nullable=True)
+
+    # 会话列表按用户+更新时间分页
+    __table_args__ = (
+        db.Index('ix_conversation_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+
+    def get_llm_context(self, model_name):
+        """返回可复用的context，模型不一致或之后有未经增量生成的消息时返回None"""
+        if (not self.llm_context or self.llm_context_model != model_name
+                or self.llm_context_messages != self.message_count):
+            return None
+        return unpack_context(self.llm_context)
+
+    def set_llm_context(self, model_name, context):
+        """保存本轮生成返回的context（需在message_count更新之后调用），context为空时清除"""
+        if not context:
+            self.llm_context = self.llm_context_model = self.llm_context_messages = None
+            return
+        self.llm_context = pack_context(context)
+        self.llm_context_model = model_name
+        self.llm_context_messages = self.message_count
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'message_count': self.message_count,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+
+# 消息模型（正文超过阈值时zlib压缩存储）
+class Message(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
+    role = db.Column(db.String(20), nullable=False)
+    body = db.Column(db.LargeBinary, nullable=False)
+    compressed = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    # 历史加载与分页均为 conversation_id 等值 + id 范围扫描
+    __table_args__ = (
+        db.Index('ix_message_conversation_id_id', 'conversation_id', 'id'),
+    )
+
+    @property
+    def content(self):
+        return (zlib.decompress(self.body) if self.compressed else self.body).decode('utf-8')
+
+    @content.setter
+    def content(self, text):
+        raw = text.encode('utf-8')
+        packed = zlib.compress(raw) if len(raw) > MESSAGE_COMPRESS_THRESHOLD else raw
+        self.compressed = len(packed) < len(raw)
+        self.body = packed if self.compressed else raw
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'role': self.role,
+            'content': self.content,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+def upgrade_schema(connection):
+    """为已存在的表补充模型中新增的列（create_all只创建缺失的表，不会修改已有的表）
 
+    只支持可空列或带server_default的列，返回补充的列名列表。
+    """
+    inspector = db.inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f"无法自动添加非空且没有server_default的列：{table.name}.{column.name}")
+            column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            table_name = connection.dialect.identifier_preparer.quote(table.name)
+            connection.execute(db.text(f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
@@ -0,0 +1,204 @@
+"""按请求的性能剖析与慢请求日志
+
+- 分阶段计时：数据库、密码哈希、验证码绘制、上游等待、上游流式传输，均记录在g上，开销仅为两次计时
+- 慢请求日志：请求总耗时超过SLOW_REQUEST_MS时输出各阶段耗时
+- 剖析：请求头X-Profile与PROFILE_TOKEN一致，或按PROFILE_SAMPLE_RATE采样时，
+  将cProfile统计（.prof）或采样得到的折叠调用栈（.folded，可直接用于生成火焰图）写入PROFILE_DIR
+"""
+import cProfile
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, TypeVar
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+PHASE_DB = 'db'
+PHASE_PASSWORD_HASH = 'password_hash'
+PHASE_CAPTCHA = 'captcha'
+PHASE_UPSTREAM_WAIT = 'upstream_wait'
+PHASE_UPSTREAM_STREAM = 'upstream_stream'
+
+
+def current_phases() -> Optional[Dict[str, float]]:
+    """当前请求的阶段耗时字典（请求上下文之外或未启用计时时返回None）"""
+    return g.get('_phases') if has_request_context() else None
+
+
+def add_phase_time(name: str, seconds: float, phases: Optional[Dict[str, float]] = None):
+    """累加当前请求（或指定的阶段耗时字典）某阶段的耗时，请求上下文之外调用且未指定字典时忽略"""
+    if phases is None:
+        phases = current_phases()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name: str):
+    """记录代码块耗时到当前请求的指定阶段"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(name, time.perf_counter() - started)
+
+
+def timed_upstream(chunks: Iterator[T], phases: Optional[Dict[str, float]] = None) -> Iterator[T]:
+    """包装上游响应迭代器：首个数据块之前计为上游等待，之后计为上游流式传输
+
+    只统计等待上游的时间，不包含下游消费数据块的耗时。
+    在后台线程中迭代时需传入请求线程中取得的phases（见current_phases）。
+    """
+    current = PHASE_UPSTREAM_WAIT
+    iterator = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            add_phase_time(current, time.perf_counter() - started, phases)
+            return
+        add_phase_time(current, time.perf_counter() - started, phases)
+        current = PHASE_UPSTREAM_STREAM
+        yield item
+
+
+class StackSampler:
+    """采样指定线程的调用栈，输出折叠格式（flamegraph.pl / speedscope可直接读取）"""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _on_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 开始时间记录在本次执行的context上：语句出错时after_cursor_execute不会触发，
+    # 记录在连接上会残留到连接池中，使之后的查询与错误的开始时间配对
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _on_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_started', None)
+    if started is not None:
+        add_phase_time(PHASE_DB, time.perf_counter() - started)
+
+
+def _should_profile(app) -> bool:
+    token = app.config.get('PROFILE_TOKEN')
+    header = request.headers.get('X-Profile')
+    if token and header and hmac.compare_digest(header, token):
+        return True
+    rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def _start_profiler(app):
+    profile_format = request.headers.get('X-Profile-Format', app.config.get('PROFILE_FORMAT', 'pstats'))
+    if profile_format == 'collapsed':
+        sampler = StackSampler(threading.get_ident(), app.config.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+        sampler.start()
+        g._profiler = ('collapsed', sampler)
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        g._profiler = ('pstats', profiler)
+
+
+def _finish_profiler(app, elapsed_ms: float):
+    kind, profiler = g._profiler
+    profile_dir = app.config.get('PROFILE_DIR', 'instance/profiles')
+    os.makedirs(profile_dir, exist_ok=True)
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', request.path.strip('/')) or 'root'
+    stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{name}-{elapsed_ms:.0f}ms"
+    if kind == 'collapsed':
+        profiler.stop()
+        path = os.path.join(profile_dir, stem + '.folded')
+        profiler.dump(path)
+    else:
+        profiler.disable()
+        path = os.path.join(profile_dir, stem + '.prof')
+        profiler.dump_stats(path)
+    logger.info(f"请求剖析结果已保存：{path}")
+
+
+def init_profiling(app):
+    """注册剖析钩子（数据库计时监听注册在Engine类上，对所有引擎生效）"""
+    if not event.contains(Engine, 'before_cursor_execute', _on_before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _on_before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _on_after_cursor_execute)
+
+    @app.before_request
+    def start_request_timer():
+        if request.headers.get('Upgrade', '').lower() == 'websocket':
+            return  # WebSocket长连接不计入请求耗时
+        g._phases = {}
+        g._request_started = time.perf_counter()
+        if _should_profile(app):
+            try:
+                _start_profiler(app)
+            except ValueError as e:  # 其他剖析器正在运行
+                logger.warning(f"启动剖析失败：{str(e)}")
+
+    # 流式响应（stream_with_context）在生成结束后才触发teardown，因此能统计完整耗时
+    @app.teardown_request
+    def finish_request_timer(exc):
+        started = g.pop('_request_started', None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        phases = g.pop('_phases', {})
+
+        if g.get('_profiler') is not None:
+            try:
+                _finish_profiler(app, elapsed_ms)
+            except OSError as e:
+                logger.warning(f"保存剖析结果失败：{str(e)}")
+            g._profiler = None
+
+        threshold = app.config.get('SLOW_REQUEST_MS', 1000)
+        if threshold is not None and elapsed_ms >= threshold:
+            breakdown = {name: round(seconds * 1000, 1) for name, seconds in phases.items()}
+            breakdown['other'] = round(elapsed_ms - sum(breakdown.values()), 1)
+            logger.warning(
+                f"慢请求：{request.method} {request.path} 耗时{elapsed_ms:.1f}ms，阶段耗时(ms)：{breakdown}"
+            )
@@ -1,25 +1,30 @@
+import json
 import logging
 import string
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from functools import wraps
 
 from flask import request, jsonify, session, url_for, make_response, g
 from flask import Blueprint, current_app, render_template, redirect, render_template_string
-
-from src.dk_client import LocalLLMClient, LocalLLMConfig
-from src.extensions import db, mail
-from src.models import User
+from flask import Response, stream_with_context
+
+from src.dk_client import ReasoningSplitter, split_reasoning, strip_reasoning
+from src.extensions import db, mail, semantic_cache, model_router
+from src.model_router import RouteBusyError
+from src.scheduler import PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from src.profiling import current_phases, phase, timed_upstream, PHASE_CAPTCHA
+from src.models import User, Conversation, Message, utcnow
+from src.search import DEFAULT_TOKENIZER, is_supported, search_messages
+from src.streaming import SlowClientError, coalesce_frames
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
-from flask_mail import Message
+from flask_mail import Message as MailMessage
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
-# 配置结构化日志（优化日志格式）
-logging.basicConfig(
-    format='%(asctime)s - %(levelname)s - %(name)s - [%(filename)s:%(lineno)d] - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger("__name__")
+logger = logging.getLogger(__name__)
 
 api_bp = Blueprint('api', __name__)
 
@@ -92,6 +97,7 @@ def login():
     # 登录成功
     session['user_id'] = user.id
     session['username'] = user.username
+    session['tier'] = user.tier
 
     response = jsonify({
         'success': True,
@@ -174,10 +180,11 @@ def get_captcha():
     session_id = request.cookies.get('session') or request.remote_addr
     captcha_store[session_id] = captcha_text.lower()
 
-    image = generate_captcha_image(captcha_text)
-    byte_io = BytesIO()
-    image.save(byte_io, 'PNG')
-    byte_io.seek(0)
+    with phase(PHASE_CAPTCHA):
+        image = generate_captcha_image(captcha_text)
+        byte_io = BytesIO()
+        image.save(byte_io, 'PNG')
+        byte_io.seek(0)
 
     response = make_response(byte_io.getvalue())
     response.headers['Content-Type'] = 'image/png'
@@ -228,7 +235,7 @@ def api_forgot_password():
             token=token,
             _external=True
         )
-        msg = Message(
+        msg = MailMessage(
             subject="DeepSeek聊天室密码重置",
             recipients=[email],
             html=f'''
@@ -370,6 +377,12 @@ def handle_api_errors(f):
     def wrapper(*args, **kwargs):
         try:
             return f(*args, **kwargs)
+        except RouteBusyError as e:
+            return jsonify({
+                'status': 'error',
+                'message': '当前请求较多，请稍后再试',
+                'error': str(e)
+            }), 503
         except APIConnectionError as e:
             logger.error(f"API连接错误: {str(e)}", exc_info=True)
             return jsonify({
@@ -397,13 +410,286 @@ def validate_chat_request(data):
     if not message or not isinstance(message, str):
         return False, "消息内容无效或缺失"
 
-    return True, {'message': message, 'username': 'user'}
+    conversation_id = data.get('conversation_id')
+    if conversation_id is not None:
+        try:
+            conversation_id = int(conversation_id)
+        except (TypeError, ValueError):
+            return False, "会话ID无效"
+
+    mode = data.get('mode')
+    if mode is not None and not isinstance(mode, str):
+        return False, "mode参数无效"
+
+    return True, {
+        'message': message,
+        'username': 'user',
+        'conversation_id': conversation_id,
+        'mode': mode,
+        'stream': bool(data.get('stream', False)),
+        'include_thinking': bool(data.get('include_thinking', False))
+    }
+
+
+def ndjson_line(data):
+    """将字典编码为一行NDJSON"""
+    return json.dumps(data, ensure_ascii=False) + '\n'
+
+
+def scheduling_key():
+    """公平调度使用的用户标识（未登录时使用客户端IP）"""
+    return session.get('user_id') or request.remote_addr
+
+
+def stream_chat_events(route, messages, include_thinking=False, on_complete=None, user='anonymous',
+                       request_chunks=None, render_event=None, cancel=None):
+    """流式生成回复，按通道输出NDJSON事件（生成期间占用路由的一个并发名额）
+
+    request_chunks(client)可替换默认的client.generate(messages, stream=True)请求方式；
+    render_event(事件字典)可替换默认的ndjson_line编码；cancel（threading.Event）置位后停止生成并输出cancelled事件。
+    STREAM_COALESCE开启时，上游读取与事件编码在后台线程中进行，输出按自适应窗口合并为帧（见src/streaming.py），
+    因此request_chunks返回的迭代器不能依赖请求上下文；生成结束、取消或客户端断开时先停止该线程并关闭上游连接，
+    再释放并发名额。
+
+    事件格式：
+    - {"type": "thinking", "content": "..."}  仅在include_thinking为True时输出
+    - {"type": "answer", "content": "..."}
+    - {"type": "done", "model": "..."} / {"type": "error", "message": "..."} / {"type": "cancelled"}
+    """
+    render_event = render_event or ndjson_line
+    splitter = ReasoningSplitter()
+    answer_parts = []
+
+    def to_events(parts):
+        for channel, text in parts:
+            if channel == 'answer':
+                answer_parts.append(text)
+            elif not include_thinking:
+                continue
+            yield render_event({'type': channel, 'content': text})
+
+    def render(chunks):
+        for chunk in chunks:
+            yield from to_events(splitter.feed_chunk(chunk))
+        yield from to_events(splitter.flush())
+
+    config = current_app.config
+    client = model_router.client(route)
+    try:
+        with model_router.acquire(route, user=user, priority=PRIORITY_INTERACTIVE):
+            chunks = request_chunks(client) if request_chunks else client.generate(messages=messages, stream=True)
+            chunks = timed_upstream(chunks, current_phases())  # 在读取上游的线程中计时
+            if config.get('STREAM_COALESCE', True):
+                frames = coalesce_frames(
+                    render(chunks),
+                    window_ms=config.get('STREAM_COALESCE_MS', 20),
+                    max_window_ms=config.get('STREAM_COALESCE_MAX_MS', 200),
+                    frame_bytes=config.get('STREAM_FRAME_BYTES', 4096),
+                    max_buffer_bytes=config.get('STREAM_MAX_BUFFER_BYTES', 256 * 1024),
+                    cancel=cancel,
+                    interrupt=lambda thread: client.interrupt(thread.ident)
+                )
+            else:
+                frames = render(chunks)
+            with closing(frames):
+                for frame in frames:
+                    yield frame
+                    if cancel is not None and cancel.is_set():
+                        break
+    except RouteBusyError:
+        yield render_event({'type': 'error', 'message': '当前请求较多，请稍后再试'})
+        return
+    except SlowClientError as e:
+        logger.warning(f"断开慢速客户端: {str(e)}")
+        yield render_event({'type': 'error', 'message': '网络过慢，输出已中断'})
+        return
+    except Exception as e:
+        logger.error(f"流式生成失败: {str(e)}")
+        yield render_event({'type': 'error', 'message': 'AI服务连接中断，请稍后再试'})
+        return
+
+    if cancel is not None and cancel.is_set():
+        yield render_event({'type': 'cancelled'})
+        return
+
+    answer = ''.join(answer_parts)
+    extra = on_complete(answer) if answer and on_complete else None
+    yield render_event({'type': 'done', 'model': client.config.model_name, **(extra or {})})
+
+
+def api_login_required(f):
+    """API登录检查装饰器（未登录时返回401 JSON而不是重定向）"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'status': 'error', 'message': '请先登录'}), 401
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def get_user_conversation(conversation_id, user_id=None):
+    """获取当前用户（或指定用户）的会话，不存在或不属于该用户时返回None"""
+    conversation = db.session.get(Conversation, conversation_id)
+    if not conversation or conversation.user_id != (user_id or session.get('user_id')):
+        return None
+    return conversation
+
+
+def load_history(conversation_id, limit):
+    """加载会话最近的limit条消息（单次索引查询，耗时与会话总长度无关）"""
+    rows = (Message.query
+            .filter_by(conversation_id=conversation_id)
+            .order_by(Message.id.desc())
+            .limit(limit)
+            .all())
+    return [{'role': row.role, 'content': row.content} for row in reversed(rows)]
+
+
+def incremental_chunks(client, context, prompt, stream, state):
+    """增量预填充：通过/api/generate只发送本轮提问（context为None时即首轮提问）
+
+    生成结束后把新的context记录到state中，由调用方随本轮对话一起保存。
+    context包含模型输出的全部token，回复中有思考过程时不记录（否则下一轮会把<think>内容带回模型），
+    下一轮改为通过/api/chat发送去掉思考过程的历史。返回的迭代器可以在后台线程中消费。
+    """
+    def track(chunks):
+        splitter = ReasoningSplitter()
+        reasoning = False
+        for chunk in chunks:
+            reasoning = reasoning or any(channel == 'thinking' for channel, _ in splitter.feed_chunk(chunk))
+            if chunk.get('done'):
+                state['context'] = None if reasoning else chunk.get('context')
+                logger.debug("增量预填充", extra={
+                    'first_turn': context is None,
+                    'reasoning': reasoning,
+                    'context_tokens': len(context or []),
+                    'prompt_eval_count': chunk.get('prompt_eval_count'),
+                    'prompt_eval_ms': round(chunk.get('prompt_eval_duration', 0) / 1e6, 1)
+                })
+            yield chunk
+
+    return track(client.generate_incremental(prompt, context=context, stream=stream))
+
+
+def save_turn(conversation, user_id, role, question, answer, llm_context=None):
+    """保存一轮对话，conversation为None时自动创建新会话
+
+    llm_context为(模型名称, context)时同时更新会话的增量预填充状态。
+    """
+    if conversation is None:
+        conversation = Conversation(user_id=user_id, title=question[:50], message_count=0)
+        db.session.add(conversation)
+        db.session.flush()
+
+    db.session.add_all([
+        Message(conversation_id=conversation.id, role=role, content=question),
+        Message(conversation_id=conversation.id, role='assistant', content=answer)
+    ])
+    conversation.message_count += 2
+    conversation.updated_at = utcnow()
+    if llm_context is not None:
+        conversation.set_llm_context(*llm_context)
+    db.session.commit()
+    return conversation
+
+
+class ChatTurn:
+    """一轮对话的准备与收尾（HTTP接口与WebSocket共用，不依赖请求上下文）
+
+    用法：
+        turn = ChatTurn(message_data, user_id, tier)
+        error = turn.load()                 # 选择模型路由并加载会话历史（可复用context时跳过）
+        cached = turn.lookup_cache()        # 首轮提问查询语义缓存
+        ... turn.request_chunks(client, stream) 发起生成 ...
+        extra = turn.finish(answer)         # 写入缓存并保存对话
+    """
+
+    def __init__(self, message_data, user_id=None, tier=None):
+        self.data = message_data
+        self.user_id = user_id
+        self.tier = tier
+        self.conversation = None
+        self.history = []
+        self.context = None
+        self.messages = []
+        self.route = None
+        self.model_name = None
+        self.prompt_vector = None
+        # 登录用户的会话使用增量预填充（见incremental_chunks），prefill记录本轮返回的context
+        self.incremental = bool(user_id) and current_app.config.get('INCREMENTAL_PREFILL', False)
+        self.prefill = {}
+
+    def load(self):
+        """选择模型路由并加载会话历史，失败时返回(错误信息, 状态码)
+
+        会话有当前模型可复用的context时不加载历史（本轮只发送新提问）。
+        """
+        if self.data['conversation_id'] is not None:
+            if not self.user_id:
+                return '请先登录', 401
+            self.conversation = get_user_conversation(self.data['conversation_id'], self.user_id)
+            if not self.conversation:
+                return '会话不存在', 404
+
+        self.route = model_router.select(self.data['message'], mode=self.data['mode'], tier=self.tier)
+        self.model_name = model_router.client(self.route).config.model_name
+
+        if self.conversation is not None:
+            if self.incremental:
+                self.context = self.conversation.get_llm_context(self.model_name)
+            if self.context is None:
+                self.history = load_history(self.conversation.id, current_app.config.get('CHAT_HISTORY_LIMIT', 20))
+        self.messages = self.history + [{"role": self.data['username'], "content": self.data['message']}]
+        return None
+
+    def lookup_cache(self):
+        """查询语义缓存（仅限首轮提问），命中时返回缓存条目"""
+        if self.conversation is not None and self.conversation.message_count:
+            return None
+        cached, vector = semantic_cache.lookup(self.data['message'], self.model_name)
+        if not cached:
+            self.prompt_vector = vector
+        return cached
+
+    def request_chunks(self, client, stream):
+        # 有可复用的context或为首轮提问时使用/api/generate（首轮提示词与/api/chat相同）；
+        # 需要发送历史时使用/api/chat，保留模型的对话模板，开启增量预填充不会比关闭时更慢
+        if self.incremental and (self.context is not None or not self.history):
+            return incremental_chunks(client, self.context, self.data['message'], stream, self.prefill)
+        return client.generate(messages=self.messages, stream=stream)
+
+    def finish(self, answer):
+        """生成完成后写入语义缓存并保存对话，返回需附加到响应中的字段"""
+        if self.prompt_vector is not None:
+            semantic_cache.store(self.data['message'], answer, self.model_name, vector=self.prompt_vector)
+        if not self.user_id:
+            return {}
+        llm_context = None
+        if self.incremental:
+            # context过长时丢弃，下一轮通过/api/chat发送最近的历史，避免状态无限增长
+            context = self.prefill.get('context')
+            if context and len(context) > current_app.config.get('INCREMENTAL_PREFILL_MAX_TOKENS', 8192):
+                context = None
+            llm_context = (self.model_name, context)
+        self.conversation = save_turn(self.conversation, self.user_id, self.data['username'], self.data['message'],
+                                      answer, llm_context=llm_context)
+        return {'conversation_id': self.conversation.id}
 
 
 @api_bp.route('/api/chat', methods=['POST'])
 @handle_api_errors
 def chat_api():
-    """处理聊天API请求 """
+    """处理聊天API请求
+
+    请求参数：
+    - message: 用户消息
+    - conversation_id: 会话ID（可选，登录用户未提供时自动创建新会话）
+    - mode: 路由模式（可选，如fast/deep，见MODEL_ROUTING_RULES）
+    - stream: 是否以NDJSON流式返回（可选）
+    - include_thinking: 是否返回模型的思考过程（可选，默认仅返回回答）
+    """
 
     # 1. 验证请求数据
     is_valid, validation_result = validate_chat_request(request.get_json())
@@ -415,36 +701,72 @@ def chat_api():
 
     message_data = validation_result
 
-    # 2. 初始化LLM配置
-    config = LocalLLMConfig(
-        endpoint=current_app.config['DEFAULT_ENDPOINT'],
-        model_name=current_app.config['DEFAULT_MODEL'],
-        temperature=current_app.config['DEFAULT_TEMPERATURE']
-    )
+    # 2. 加载会话历史并选择模型路由
+    turn = ChatTurn(message_data, session.get('user_id'), session.get('tier'))
+    error = turn.load()
+    if error:
+        return jsonify({'status': 'error', 'message': error[0]}), error[1]
+    model_name = turn.model_name
+
+    # 3. 查询语义缓存（仅限首轮提问），命中时跳过生成
+    cached = turn.lookup_cache()
+    if cached:
+        extra = turn.finish(cached['response'])
+        if message_data['stream']:
+            return Response(
+                ndjson_line({'type': 'answer', 'content': cached['response']})
+                + ndjson_line({'type': 'done', 'model': model_name, 'cached': True, **extra}),
+                mimetype='application/x-ndjson'
+            )
+        return jsonify({
+            'response': cached['response'],
+            'status': 'success',
+            'model': model_name,
+            'cached': True,
+            **extra
+        })
 
-    # 3. 创建客户端并生成响应
-    client = LocalLLMClient(config)
-    messages = [{"role": message_data['username'], "content": message_data['message']}]
+    # 4. 生成响应
+    if message_data['stream']:
+        return Response(
+            stream_with_context(stream_chat_events(
+                turn.route, turn.messages,
+                include_thinking=message_data['include_thinking'],
+                on_complete=turn.finish,
+                user=scheduling_key(),
+                request_chunks=lambda client: turn.request_chunks(client, stream=True)
+            )),
+            mimetype='application/x-ndjson'
+        )
 
     try:
-        response = client.generate(messages=messages)
-        result = next(response)
+        with model_router.acquire(turn.route, user=scheduling_key(), priority=PRIORITY_INTERACTIVE) as client:
+            result = next(timed_upstream(turn.request_chunks(client, stream=False)))
 
-        # 4. 验证并处理响应
+        # 5. 验证并处理响应（分离思考过程，只缓存和保存最终回答）
         if not result or not isinstance(result, dict):
             raise ValueError("无效的API响应格式")
 
-        content = result.get('message', {}).get('content', '')
+        thinking, content = split_reasoning(result.get('message', {}).get('content', ''))
+        thinking = result.get('message', {}).get('thinking') or thinking
+        extra = {}
         if not content:
             logger.warning("收到空响应内容", extra={"response": result})
             content = "抱歉，我无法理解这个问题。"
+        else:
+            extra = turn.finish(content)
 
-        # 5. 返回成功响应
-        return jsonify({
+        # 6. 返回成功响应
+        payload = {
             'response': content,
             'status': 'success',
-            'model': current_app.config['DEFAULT_MODEL']
-        })
+            'model': model_name,
+            'route': turn.route,
+            **extra
+        }
+        if message_data['include_thinking']:
+            payload['thinking'] = thinking
+        return jsonify(payload)
 
     except StopIteration:
         logger.error("API响应为空")
@@ -454,6 +776,254 @@ def chat_api():
         }), 503
 
 
+@api_bp.route('/api/conversations', methods=['GET'])
+@api_login_required
+def list_conversations():
+    """分页获取当前用户的会话列表（按最近更新排序）"""
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    pagination = (Conversation.query
+                  .filter_by(user_id=session['user_id'])
+                  .order_by(Conversation.updated_at.desc())
+                  .paginate(page=page, per_page=per_page, error_out=False))
+    return jsonify({
+        'status': 'success',
+        'conversations': [c.to_dict() for c in pagination.items],
+        'page': pagination.page,
+        'pages': pagination.pages,
+        'total': pagination.total
+    })
+
+
+@api_bp.route('/api/conversations', methods=['POST'])
+@api_login_required
+def create_conversation():
+    """创建空会话"""
+    data = request.get_json(silent=True) or {}
+    title = str(data.get('title') or '新对话')[:200]
+    conversation = Conversation(user_id=session['user_id'], title=title, message_count=0)
+    db.session.add(conversation)
+    db.session.commit()
+    return jsonify({'status': 'success', 'conversation': conversation.to_dict()}), 201
+
+
+@api_bp.route('/api/conversations/<int:conversation_id>/messages', methods=['GET'])
+@api_login_required
+def list_messages(conversation_id):
+    """按消息ID游标分页获取会话消息
+
+    查询参数：
+    - before: 仅返回ID小于该值的消息（用于向上加载更早的消息）
+    - limit: 每页条数，默认50，最大200
+    """
+    conversation = get_user_conversation(conversation_id)
+    if not conversation:
+        return jsonify({'status': 'error', 'message': '会话不存在'}), 404
+
+    limit = max(1, min(request.args.get('limit', 50, type=int), 200))
+    query = Message.query.filter_by(conversation_id=conversation_id)
+    before = request.args.get('before', type=int)
+    if before:
+        query = query.filter(Message.id < before)
+    rows = query.order_by(Message.id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = list(reversed(rows[:limit]))
+    return jsonify({
+        'status': 'success',
+        'conversation': conversation.to_dict(),
+        'messages': [row.to_dict() for row in rows],
+        'next_before': rows[0].id if has_more and rows else None
+    })
+
+
+@api_bp.route('/api/search', methods=['GET'])
+@api_login_required
+def search_api():
+    """检索当前用户的聊天记录
+
+    查询参数：
+    - q: 关键词，多个关键词用空格分隔（均需匹配）
+    - page: 页码，从1开始
+    - limit: 每页条数，默认20，最大50
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'status': 'error', 'message': '搜索关键词不能为空'}), 400
+    if len(query) > 200:
+        return jsonify({'status': 'error', 'message': '搜索关键词不能超过200个字符'}), 400
+    if not current_app.config.get('SEARCH_ENABLED', True) or not is_supported(db.engine):
+        return jsonify({'status': 'error', 'message': '搜索功能未启用'}), 503
+
+    page = max(1, request.args.get('page', 1, type=int))
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    results = search_messages(
+        db.session,
+        session['user_id'],
+        query,
+        limit=limit + 1,
+        offset=(page - 1) * limit,
+        tokenizer=current_app.config.get('SEARCH_TOKENIZER', DEFAULT_TOKENIZER),
+        max_candidates=current_app.config.get('SEARCH_MAX_CANDIDATES', 1000)
+    )
+    return jsonify({
+        'status': 'success',
+        'results': results[:limit],
+        'page': page,
+        'has_more': len(results) > limit
+    })
+
+
+def validate_batch_request(data):
+    """验证批量聊天请求数据
+
+    支持两种格式：
+    - {"prompts": ["问题1", "问题2"]}
+    - {"items": [{"id": "a", "message": "问题"}, {"id": "b", "messages": [...], "options": {...}}]}
+    """
+    if not data or not isinstance(data, dict):
+        return False, "请求体不能为空"
+
+    raw_items = data.get('items')
+    if raw_items is None:
+        prompts = data.get('prompts')
+        if not isinstance(prompts, list):
+            return False, "缺少items或prompts参数"
+        raw_items = [{'message': prompt} for prompt in prompts]
+
+    if not isinstance(raw_items, list) or not raw_items:
+        return False, "items必须为非空列表"
+
+    max_items = current_app.config.get('BATCH_MAX_ITEMS', 100)
+    if len(raw_items) > max_items:
+        return False, f"单次批量请求最多{max_items}条"
+
+    items = []
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            return False, f"第{index}条数据格式无效"
+
+        messages = raw.get('messages')
+        if messages is None:
+            message = raw.get('message')
+            if not message or not isinstance(message, str):
+                return False, f"第{index}条消息内容无效或缺失"
+            messages = [{"role": "user", "content": message}]
+        elif not isinstance(messages, list) or not messages or not all(
+                isinstance(m, dict) and isinstance(m.get('content'), str) for m in messages):
+            return False, f"第{index}条对话历史格式无效"
+
+        mode = raw.get('mode')
+        if mode is not None and not isinstance(mode, str):
+            return False, f"第{index}条mode参数无效"
+
+        options = raw.get('options')
+        if options is not None and not isinstance(options, dict):
+            return False, f"第{index}条options参数无效"
+        options = dict(options or {})
+        if 'temperature' in raw:
+            options['temperature'] = raw['temperature']
+
+        items.append({
+            'id': raw.get('id', index),
+            'index': index,
+            'mode': mode,
+            'messages': strip_reasoning(messages),
+            'options': options
+        })
+
+    # 全部条目校验通过后再选择路由（被拒绝的请求不计入路由统计）
+    for item in items:
+        item['route'] = model_router.select(item['messages'][-1]['content'], mode=item.pop('mode'),
+                                            tier=session.get('tier'))
+
+    return True, {'items': items, 'parallelism': data.get('parallelism')}
+
+
+def run_batch_item(item, user):
+    """执行单条批量请求，失败时返回错误结果而不是抛出异常"""
+    started = time.perf_counter()
+    result = {'id': item['id'], 'index': item['index'], 'route': item['route']}
+    try:
+        kwargs = {'options': item['options']} if item['options'] else {}
+        with model_router.acquire(item['route'], user=user, priority=PRIORITY_BATCH) as client:
+            response = next(client.generate(messages=item['messages'], **kwargs))
+        result.update({
+            'status': 'success',
+            'response': split_reasoning(response.get('message', {}).get('content', ''))[1],
+            'model': response.get('model', client.config.model_name)
+        })
+    except Exception as e:
+        logger.warning(f"批量请求第{item['index']}条失败: {str(e)}")
+        result.update({'status': 'error', 'message': str(e)})
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+@api_bp.route('/api/chat/batch', methods=['POST'])
+@handle_api_errors
+def chat_batch_api():
+    """批量聊天API：并发执行多条请求，按完成顺序以NDJSON流式返回结果
+
+    批量请求以batch优先级调度，交互式聊天优先获得模型名额。
+    """
+
+    is_valid, validation_result = validate_batch_request(request.get_json(silent=True))
+    if not is_valid:
+        return jsonify({
+            'status': 'error',
+            'message': validation_result
+        }), 400
+
+    items = validation_result['items']
+    max_parallel = current_app.config.get('BATCH_MAX_PARALLEL', 4)
+    try:
+        parallelism = int(validation_result['parallelism'] or max_parallel)
+    except (TypeError, ValueError):
+        parallelism = max_parallel
+    parallelism = max(1, min(parallelism, max_parallel, len(items)))
+
+    user = scheduling_key()
+
+    def generate():
+        succeeded = failed = 0
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='chat-batch')
+        try:
+            futures = [executor.submit(run_batch_item, item, user) for item in items]
+            for future in as_completed(futures):
+                result = future.result()
+                if result['status'] == 'success':
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+
+            yield json.dumps({'summary': {
+                'total': len(items),
+                'succeeded': succeeded,
+                'failed': failed,
+                'parallelism': parallelism,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+            }}, ensure_ascii=False) + '\n'
+        finally:
+            # 客户端断开时取消尚未开始的请求
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@api_bp.route('/api/routing/stats', methods=['GET'])
+@api_login_required
+def routing_stats():
+    """导出模型路由统计"""
+    return jsonify({
+        'status': 'success',
+        'default_route': model_router.default_route,
+        'routes': model_router.stats()
+    })
+
+
 # 错误处理
 @api_bp.errorhandler(404)
 def not_found(error):
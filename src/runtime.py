@@ -0,0 +1,41 @@
+"""生产环境工作进程初始化（gunicorn预加载应用后fork出多个工作进程，见gunicorn.conf.py）
+
+主进程中create_app创建的后台线程、连接池、文件句柄不能在fork后的子进程中继续使用：
+线程不会随fork复制，连接和文件句柄会被父子进程共用。init_worker在每个工作进程启动后调用一次，
+重建这些进程级资源；应用代码、配置和路由表仍与主进程共享（写时复制）。
+"""
+import logging
+import signal
+
+from src.extensions import db, health_prober, model_router
+from src.logging_setup import start_listener
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker(app):
+    """fork后在工作进程中重建日志线程、数据库连接池、模型客户端与调度器和健康检查线程
+
+    语义缓存在各进程首次使用时自行打开独占的持久化目录（见SemanticCache），无需在此处理。
+    """
+    start_listener()
+    with app.app_context():
+        # 丢弃从主进程继承的连接（close=False：不关闭父进程仍可能使用的底层连接）
+        db.engine.dispose(close=False)
+    model_router.init_app(app)
+    health_prober.init_app(app)
+    health_prober.start()
+    install_drain_handler()
+    logger.info("工作进程初始化完成")
+
+
+def install_drain_handler():
+    """收到SIGTERM时先将就绪检查置为未就绪，再交给原有的处理函数（gunicorn停止接受新请求并等待进行中的请求完成）"""
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle(signum, frame):
+        health_prober.mark_draining()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle)
@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# 优先级类别（按优先级从高到低）
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BATCH = 'batch'
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+
+class SchedulerTimeoutError(Exception):
+    """排队等待超时"""
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        super().__init__(f"[调度超时] {priority}请求排队超时")
+
+
+class SchedulerFullError(Exception):
+    """排队人数已达上限，拒绝新请求"""
+
+    def __init__(self, queued: int):
+        self.queued = queued
+        super().__init__(f"[队列已满] 当前排队{queued}个请求")
+
+
+class _Waiter:
+    __slots__ = ('user', 'priority', 'enqueued', 'event', 'granted')
+
+    def __init__(self, user: str, priority: str):
+        self.user = user
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+
+
+class FairScheduler:
+    """公平、分优先级的生成名额调度器
+
+    调度策略：
+    - 名额数量等于后端允许的并发生成数，有空闲名额且无人排队时直接放行
+    - 高优先级（interactive）总是先于低优先级（batch）调度
+    - 同一优先级内按用户轮询，单个用户提交大量请求不会阻塞其他用户
+    - 低优先级请求排队超过starvation_seconds后提升为最高优先级，保证不会饿死
+    """
+
+    def __init__(self, capacity: int = 1, max_queue: Optional[int] = None,
+                 starvation_seconds: float = 30.0, sample_size: int = 1000):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.starvation_seconds = starvation_seconds
+        self._lock = threading.Lock()
+        self._active = 0
+        # 每个优先级：用户 -> 该用户的等待队列（OrderedDict顺序即轮询顺序）
+        self._queues: Dict[str, OrderedDict] = {p: OrderedDict() for p in PRIORITY_CLASSES}
+        self._queued = {p: 0 for p in PRIORITY_CLASSES}
+        self._stats = {p: {'granted': 0, 'timeouts': 0, 'rejected': 0, 'promoted': 0,
+                           'waits': deque(maxlen=sample_size)} for p in PRIORITY_CLASSES}
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    @property
+    def saturated(self) -> bool:
+        """排队人数达到上限（用于就绪检查）"""
+        return self.max_queue is not None and self.queued >= self.max_queue
+
+    @contextmanager
+    def acquire(self, user: str, priority: str = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """排队获取一个名额，退出上下文时释放
+
+        Raises:
+            SchedulerFullError: 排队人数已达上限
+            SchedulerTimeoutError: 等待超时
+        """
+        self.wait_for_slot(user, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def wait_for_slot(self, user: str, priority: str = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """排队获取一个名额（成功后必须调用release释放）"""
+        if priority not in self._queues:
+            raise ValueError(f"未知的优先级：{priority}")
+        waiter = self._enqueue(user, priority)
+        if waiter.granted:
+            return
+        waiter.event.wait(timeout)
+        with self._lock:
+            if not waiter.granted:
+                self._remove(waiter)
+                self._stats[priority]['timeouts'] += 1
+                raise SchedulerTimeoutError(priority)
+
+    def _enqueue(self, user: str, priority: str) -> _Waiter:
+        waiter = _Waiter(user, priority)
+        with self._lock:
+            if self._active < self.capacity and not self.queued:
+                self._grant(waiter)
+                return waiter
+            if self.max_queue is not None and self.queued >= self.max_queue:
+                self._stats[priority]['rejected'] += 1
+                raise SchedulerFullError(self.queued)
+            self._queues[priority].setdefault(user, deque()).append(waiter)
+            self._queued[priority] += 1
+        return waiter
+
+    def _remove(self, waiter: _Waiter):
+        users = self._queues[waiter.priority]
+        pending = users.get(waiter.user)
+        if pending and waiter in pending:
+            pending.remove(waiter)
+            self._queued[waiter.priority] -= 1
+            if not pending:
+                del users[waiter.user]
+
+    def _grant(self, waiter: _Waiter):
+        self._active += 1
+        waiter.granted = True
+        self._stats[waiter.priority]['granted'] += 1
+        self._stats[waiter.priority]['waits'].append(time.monotonic() - waiter.enqueued)
+        waiter.event.set()
+
+    def release(self):
+        """释放名额并放行下一个排队请求"""
+        with self._lock:
+            self._active -= 1
+            while self._active < self.capacity:
+                waiter = self._next_waiter()
+                if waiter is None:
+                    break
+                self._grant(waiter)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """选择下一个放行的请求（调用方需持有锁）"""
+        # 饥饿保护：低优先级中等待最久的请求超过阈值时优先放行
+        now = time.monotonic()
+        for priority in PRIORITY_CLASSES[1:]:
+            users = self._queues[priority]
+            if not users:
+                continue
+            user = min(users, key=lambda u: users[u][0].enqueued)
+            if now - users[user][0].enqueued >= self.starvation_seconds:
+                self._stats[priority]['promoted'] += 1
+                return self._pop(priority, user)
+
+        for priority in PRIORITY_CLASSES:
+            if self._queues[priority]:
+                # 轮询：取队首用户，其后续请求排到本轮末尾
+                return self._pop(priority, next(iter(self._queues[priority])))
+        return None
+
+    def _pop(self, priority: str, user: str) -> _Waiter:
+        users = self._queues[priority]
+        pending = users[user]
+        waiter = pending.popleft()
+        self._queued[priority] -= 1
+        if pending:
+            users.move_to_end(user)
+        else:
+            del users[user]
+        return waiter
+
+    def stats(self) -> Dict[str, Any]:
+        """导出各优先级的排队统计（等待时间单位：毫秒）"""
+        with self._lock:
+            result = {'capacity': self.capacity, 'active': self._active, 'queued': self.queued}
+            for priority, stats in self._stats.items():
+                waits = sorted(stats['waits'])
+                result[priority] = {
+                    'queued': self._queued[priority],
+                    'granted': stats['granted'],
+                    'timeouts': stats['timeouts'],
+                    'rejected': stats['rejected'],
+                    'promoted': stats['promoted'],
+                    'wait_avg_ms': round(sum(waits) / len(waits) * 1000, 1) if waits else None,
+                    'wait_p95_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1)
+                    if waits else None
+                }
+            return result
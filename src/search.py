@@ -0,0 +1,267 @@
+"""聊天记录全文检索（SQLite FTS5）
+
+- 索引表message_fts与message表同库，rowid即消息ID；消息插入/删除时通过ORM事件在同一事务内增量同步，
+  插入时覆盖同一rowid的旧索引（批量删除或drop_all不触发ORM事件，消息ID被复用时会残留旧索引）
+- owner列保存用户标记，查询时作为MATCH条件的一部分，由FTS倒排索引直接限定到当前用户，
+  而不是先匹配全部用户的消息再过滤
+- 默认使用trigram分词器（SQLite>=3.34），中文无需分词即可按子串检索；
+  短于3个字符的关键词无法走trigram索引，退化为在当前用户的消息中做LIKE匹配
+- 消息正文可能压缩存储，因此索引表自带正文副本（相关度计算与片段高亮需要原文）
+- 只在当前用户最近的命中消息中排序（见search_messages），查询耗时不随全库数据量增长
+- 非SQLite数据库不启用
+"""
+import html
+import logging
+import math
+import re
+
+from sqlalchemy import event, select, text
+
+from src.models import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'message_fts'
+DEFAULT_TOKENIZER = 'trigram'
+
+# 已确认存在索引表的数据库URL（避免每次插入都查询sqlite_master）；
+# 只缓存存在的结果，启动后才创建索引表时无需重启即可生效
+_index_ready = set()
+
+
+# 用户标记由3个私用区字符组成（基数6400，可表示约2.6e11个用户）：
+# trigram分词下恰好是一个词元，不同用户不会共享，unicode61分词下同样是一个完整词元
+_OWNER_BASE = 0xE000
+_OWNER_RADIX = 6400
+
+
+def owner_token(user_id: int) -> str:
+    digits = []
+    for _ in range(3):
+        user_id, digit = divmod(user_id, _OWNER_RADIX)
+        digits.append(chr(_OWNER_BASE + digit))
+    return ''.join(reversed(digits))
+
+
+def is_supported(bind) -> bool:
+    return bind.dialect.name == 'sqlite'
+
+
+def index_exists(connection) -> bool:
+    key = str(connection.engine.url)
+    if key in _index_ready:
+        return True
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FTS_TABLE}
+    ).first() is not None
+    if exists:
+        _index_ready.add(key)
+    return exists
+
+
+def create_search_index(connection, tokenizer: str = DEFAULT_TOKENIZER):
+    """创建索引表（已存在时不做任何操作）"""
+    if not re.fullmatch(r'[A-Za-z0-9_ ]+', tokenizer):
+        raise ValueError(f"无效的分词器配置：{tokenizer}")
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        f"USING fts5(content, owner, conversation_id UNINDEXED, tokenize = '{tokenizer}')"
+    ))
+    _index_ready.add(str(connection.engine.url))
+
+
+def drop_search_index(connection):
+    connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    _index_ready.discard(str(connection.engine.url))
+
+
+def rebuild_search_index(session, tokenizer: str = DEFAULT_TOKENIZER, batch_size: int = 1000,
+                         progress=None) -> int:
+    """删除并重建索引表，分批从message表导入（消息正文需在Python中解压）
+
+    Returns:
+        已索引的消息数
+    """
+    connection = session.connection()
+    drop_search_index(connection)
+    create_search_index(connection, tokenizer)
+
+    insert = text(
+        f"INSERT INTO {FTS_TABLE} (rowid, content, owner, conversation_id) "
+        f"VALUES (:id, :content, :owner, :conversation_id)"
+    )
+    query = (
+        select(Message, Conversation.user_id)
+        .join(Conversation, Message.conversation_id == Conversation.id)
+        .order_by(Message.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    total = 0
+    rows = []
+    for message, user_id in session.execute(query):
+        rows.append({
+            'id': message.id,
+            'content': message.content,
+            'owner': owner_token(user_id),
+            'conversation_id': message.conversation_id
+        })
+        if len(rows) >= batch_size:
+            connection.execute(insert, rows)
+            total += len(rows)
+            rows = []
+            if progress:
+                progress(total)
+    if rows:
+        connection.execute(insert, rows)
+        total += len(rows)
+
+    # 合并索引段，提升查询性能
+    connection.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    session.commit()
+    return total
+
+
+def _on_message_insert(mapper, connection, target):
+    if not is_supported(connection) or not index_exists(connection):
+        return
+    user_id = connection.execute(
+        text("SELECT user_id FROM conversation WHERE id = :id"), {'id': target.conversation_id}
+    ).scalar()
+    if user_id is None:
+        return
+    connection.execute(
+        text(
+            f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, content, owner, conversation_id) "
+            f"VALUES (:id, :content, :owner, :conversation_id)"
+        ),
+        {'id': target.id, 'content': target.content, 'owner': owner_token(user_id),
+         'conversation_id': target.conversation_id}
+    )
+
+
+def _on_message_delete(mapper, connection, target):
+    if not is_supported(connection) or not index_exists(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': target.id})
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _escape_like(term: str) -> str:
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def build_query(user_id: int, query: str, tokenizer: str = DEFAULT_TOKENIZER):
+    """将用户输入转换为FTS5查询
+
+    所有关键词均作为短语（双引号转义），多个关键词为AND关系，不支持用户直接编写FTS语法。
+
+    Returns:
+        (MATCH表达式, 需要LIKE匹配的短关键词列表)
+    """
+    min_length = 3 if tokenizer.split()[0] == 'trigram' else 1
+    terms = [term for term in query.split() if term]
+    long_terms = [term for term in terms if len(term) >= min_length]
+    short_terms = [term for term in terms if len(term) < min_length]
+    expression = ' AND '.join([f"owner : {_quote(owner_token(user_id))}"] +
+                              [f"content : {_quote(term)}" for term in long_terms])
+    return expression, short_terms
+
+
+def _term_pattern(terms: list[str]) -> re.Pattern:
+    # 长关键词优先，避免短关键词抢先匹配重叠部分
+    return re.compile('|'.join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True)),
+                      re.IGNORECASE)
+
+
+def render_snippet(content: str, pattern: re.Pattern, length: int = 64) -> str:
+    """截取首个命中位置附近的片段，转义HTML并用<mark>高亮关键词"""
+    first = pattern.search(content)
+    start = max(0, (first.start() if first else 0) - length // 4)
+    end = min(len(content), start + length)
+    window = content[start:end]
+
+    parts = ['…'] if start > 0 else []
+    position = 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        position = match.end()
+    parts.append(html.escape(window[position:]))
+    if end < len(content):
+        parts.append('…')
+    return ''.join(parts)
+
+
+def score_bm25(documents: list[str], terms: list[str], k1: float = 1.2, b: float = 0.75) -> list[float]:
+    """在候选集合内计算BM25（文档频率与平均长度均取自候选集合）"""
+    if not documents:
+        return []
+    patterns = [re.compile(re.escape(term), re.IGNORECASE) for term in set(terms)]
+    frequencies = [[len(p.findall(document)) for p in patterns] for document in documents]
+    average_length = sum(len(document) for document in documents) / len(documents) or 1
+    idf = []
+    for index in range(len(patterns)):
+        df = sum(1 for row in frequencies if row[index])
+        idf.append(math.log(1 + (len(documents) - df + 0.5) / (df + 0.5)))
+
+    scores = []
+    for document, row in zip(documents, frequencies):
+        norm = k1 * (1 - b + b * len(document) / average_length)
+        scores.append(sum(w * tf * (k1 + 1) / (tf + norm) for w, tf in zip(idf, row) if tf))
+    return scores
+
+
+def search_messages(connection, user_id: int, query: str, limit: int = 20, offset: int = 0,
+                    tokenizer: str = DEFAULT_TOKENIZER, max_candidates: int = 1000,
+                    snippet_length: int = 64) -> list[dict]:
+    """检索指定用户的消息，按相关度排序
+
+    FTS5内置的bm25()每次查询都要遍历关键词在全库（所有用户）的倒排列表以计算IDF，
+    高频词在千万级数据下耗时随总量线性增长。这里改为按rowid倒序取当前用户最近的
+    max_candidates条命中消息（FTS原生顺序，可提前终止），再在候选集合内计算BM25排序，
+    查询耗时只与单个用户的数据量有关。
+
+    Args:
+        connection: SQLAlchemy连接或会话
+
+    Returns:
+        结果列表（调用方可多取一条，据此判断是否有下一页）
+    """
+    expression, short_terms = build_query(user_id, query, tokenizer)
+    params = {'expression': expression, 'candidates': max_candidates}
+    like_clauses = []
+    for index, term in enumerate(short_terms):
+        params[f'like_{index}'] = f"%{_escape_like(term)}%"
+        like_clauses.append(f"AND content LIKE :like_{index} ESCAPE '\\'")
+
+    rows = connection.execute(text(
+        f"SELECT rowid AS id, conversation_id, content FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH :expression {' '.join(like_clauses)} "
+        f"ORDER BY rowid DESC LIMIT :candidates"
+    ), params).all()
+
+    terms = query.split()
+    scores = score_bm25([row.content for row in rows], terms)
+    ranked = sorted(zip(scores, rows), key=lambda item: (-item[0], -item[1].id))[offset:offset + limit]
+
+    pattern = _term_pattern(terms)
+    return [{
+        'message_id': row.id,
+        'conversation_id': row.conversation_id,
+        'snippet': render_snippet(row.content, pattern, snippet_length),
+        'score': round(score, 4)
+    } for score, row in ranked]
+
+
+def init_search(app):
+    """注册消息表的索引同步事件（注册在Message映射上，对所有引擎生效）"""
+    if not app.config.get('SEARCH_ENABLED', True):
+        return
+    if not event.contains(Message, 'after_insert', _on_message_insert):
+        event.listen(Message, 'after_insert', _on_message_insert)
+        event.listen(Message, 'after_delete', _on_message_delete)
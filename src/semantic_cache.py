@@ -0,0 +1,306 @@
+import logging
+import os
+import shelve
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from pydantic import BaseModel, field_validator
+from requests.exceptions import RequestException
+
+from src.dk_client import derive_ollama_url
+
+try:  # NumPy为可选依赖，未安装时语义缓存自动禁用
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+try:  # 文件锁（Windows不可用）
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCacheConfig(BaseModel):
+    """语义缓存配置类
+
+    属性：
+    endpoint: Ollama向量接口地址
+    model_name: 向量模型名称（需提前通过ollama pull拉取）
+    threshold: 余弦相似度命中阈值，范围(0.0, 1.0]
+    capacity: 最大缓存条目数，超出后淘汰最久未命中的条目
+    path: 持久化目录，为空时仅保存在内存中
+    timeout: 向量请求超时时间（秒）
+    """
+    endpoint: str = "http://localhost:11434/api/embeddings"
+    model_name: str = "nomic-embed-text"
+    threshold: float = 0.92
+    capacity: int = 10000
+    path: Optional[str] = None
+    timeout: int = 30
+
+    @field_validator("threshold")
+    def validate_threshold(cls, value: float) -> float:
+        """验证相似度阈值有效性"""
+        if not 0.0 < value <= 1.0:
+            raise ValueError("相似度阈值必须在(0.0, 1.0]范围内")
+        return value
+
+    @field_validator("capacity")
+    def validate_capacity(cls, value: int) -> int:
+        """验证缓存容量有效性"""
+        if value <= 0:
+            raise ValueError("缓存容量必须为正整数")
+        return value
+
+
+class SemanticCache:
+    """基于Ollama向量的语义响应缓存
+
+    功能：
+    - 调用本地Ollama向量接口计算提示词向量（已归一化）
+    - 使用NumPy矩阵运算一次性计算与全部缓存条目的余弦相似度（只在同一模型的条目中比较）
+    - 向量矩阵与访问时间通过内存映射文件持久化，响应文本存于shelve
+    - 达到容量上限后淘汰最久未命中的条目
+
+    持久化文件不支持多进程同时写入：每个进程在首次使用时（按进程号判断，fork后的子进程会重新打开）
+    通过文件锁独占一个目录，首选SEMANTIC_CACHE_PATH，已被占用时依次使用PATH-1、PATH-2……
+    """
+
+    VECTORS_FILE = 'vectors.npy'
+    LAST_USED_FILE = 'last_used.npy'
+    ENTRIES_FILE = 'entries'
+    LOCK_FILE = '.lock'
+    MAX_DIRECTORIES = 64
+
+    def __init__(self, config: Optional[SemanticCacheConfig] = None, app=None):
+        self.config = config
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None  # 打开持久化文件的进程号
+        self._directory: Optional[str] = None
+        self._lock_file = None
+        self._inherited = []  # fork前父进程打开的文件句柄（保留引用，避免回收时在子进程中写入）
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+
+    def _reset(self):
+        self._vectors = None  # (capacity, dim) float32
+        self._last_used = None  # (capacity,) float64，0表示空槽位
+        self._slot_models = None  # (capacity,) int32，各槽位所属模型的编号，-1表示空槽位
+        self._model_codes: Dict[str, int] = {}
+        self._entries: Any = {}
+        self._size = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.config is not None and np is not None
+
+    @property
+    def directory(self) -> Optional[str]:
+        """当前进程使用的持久化目录"""
+        return self._directory
+
+    def init_app(self, app):
+        """从Flask配置初始化缓存（SEMANTIC_CACHE_ENABLED为False时不启用）"""
+        app.extensions['semantic_cache'] = self
+        if not app.config.get('SEMANTIC_CACHE_ENABLED', False):
+            return
+        if np is None:
+            logger.warning("未安装NumPy，语义缓存已禁用")
+            return
+
+        self.config = SemanticCacheConfig(
+            endpoint=derive_ollama_url(
+                app.config.get('DEFAULT_ENDPOINT', 'http://localhost:11434/api/chat'),
+                '/api/embeddings'
+            ),
+            model_name=app.config.get('SEMANTIC_CACHE_MODEL', 'nomic-embed-text'),
+            threshold=app.config.get('SEMANTIC_CACHE_THRESHOLD', 0.92),
+            capacity=app.config.get('SEMANTIC_CACHE_CAPACITY', 10000),
+            path=app.config.get('SEMANTIC_CACHE_PATH')
+        )
+        self._pid = None
+
+    def _ensure_open(self):
+        """在当前进程中首次使用时打开持久化文件（需持有self._lock）"""
+        if self._pid == os.getpid():
+            return
+        if self._pid is not None:
+            self._inherited.append((self._entries, self._vectors, self._last_used, self._lock_file))
+            self._lock_file = None
+        self._pid = os.getpid()
+        self._reset()
+        self._open()
+
+    def _acquire_directory(self, path: str) -> Optional[str]:
+        """加锁选择当前进程独占的持久化目录，全部被占用时返回None（仅缓存在内存中）"""
+        if fcntl is None:  # 不支持文件锁的平台只使用配置的目录
+            os.makedirs(path, exist_ok=True)
+            return path
+        for index in range(self.MAX_DIRECTORIES):
+            directory = path if index == 0 else f"{path}-{index}"
+            os.makedirs(directory, exist_ok=True)
+            lock_file = open(os.path.join(directory, self.LOCK_FILE), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            self._lock_file = lock_file
+            return directory
+        logger.warning(f"语义缓存目录均被其他进程占用，当前进程仅在内存中缓存：{path}")
+        return None
+
+    def _open(self):
+        """加载持久化数据（向量维度在首次写入时确定）"""
+        self._directory = self._acquire_directory(self.config.path) if self.config.path else None
+        if not self._directory:
+            return
+        self._entries = shelve.open(os.path.join(self._directory, self.ENTRIES_FILE))
+
+        vectors_path = os.path.join(self._directory, self.VECTORS_FILE)
+        last_used_path = os.path.join(self._directory, self.LAST_USED_FILE)
+        if not (os.path.exists(vectors_path) and os.path.exists(last_used_path)):
+            return
+        try:
+            vectors = np.load(vectors_path, mmap_mode='r+')
+            last_used = np.load(last_used_path, mmap_mode='r+')
+        except (OSError, ValueError) as e:
+            logger.warning(f"语义缓存文件损坏，已重建：{str(e)}")
+            return
+        if vectors.shape[0] != self.config.capacity or last_used.shape[0] != self.config.capacity:
+            logger.warning("语义缓存容量配置已变更，已重建缓存")
+            return
+        self._vectors, self._last_used = vectors, last_used
+        self._size = int(np.count_nonzero(last_used))
+        self._slot_models = np.full(self.config.capacity, -1, dtype=np.int32)
+        for slot in range(self._size):
+            entry = self._entries.get(str(slot))
+            if entry:
+                self._slot_models[slot] = self._model_code(entry.get('model'))
+
+    def _model_code(self, model: str) -> int:
+        return self._model_codes.setdefault(model, len(self._model_codes))
+
+    def _allocate(self, dim: int):
+        """按向量维度分配（或重建）存储矩阵"""
+        capacity = self.config.capacity
+        if self._directory:
+            self._vectors = np.lib.format.open_memmap(
+                os.path.join(self._directory, self.VECTORS_FILE),
+                mode='w+', dtype=np.float32, shape=(capacity, dim)
+            )
+            self._last_used = np.lib.format.open_memmap(
+                os.path.join(self._directory, self.LAST_USED_FILE),
+                mode='w+', dtype=np.float64, shape=(capacity,)
+            )
+            self._entries.clear()
+        else:
+            self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+            self._last_used = np.zeros(capacity, dtype=np.float64)
+            self._entries = {}
+        self._slot_models = np.full(capacity, -1, dtype=np.int32)
+        self._model_codes = {}
+        self._size = 0
+
+    def embed(self, text: str):
+        """计算文本的归一化向量
+
+        Raises:
+            RequestException: 向量接口请求失败
+            ValueError: 响应缺少向量数据
+        """
+        response = self.session.post(
+            self.config.endpoint,
+            json={"model": self.config.model_name, "prompt": text},
+            timeout=self.config.timeout
+        )
+        response.raise_for_status()
+        embedding = response.json().get("embedding")
+        if not embedding:
+            raise ValueError("向量接口未返回embedding字段")
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, prompt: str, model: str) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """查找同一模型下语义相近的缓存响应
+
+        Returns:
+            (命中条目或None, 提示词向量)；向量接口不可用时返回(None, None)
+        """
+        if not self.enabled:
+            return None, None
+        try:
+            vector = self.embed(prompt)
+        except (RequestException, ValueError) as e:
+            logger.warning(f"语义缓存向量计算失败：{str(e)}")
+            return None, None
+
+        with self._lock:
+            self._ensure_open()
+            code = self._model_codes.get(model)
+            if self._size == 0 or code is None or self._vectors.shape[1] != vector.shape[0]:
+                return None, vector
+            # 先排除其他模型的条目再取最大值，避免其他模型的更高分条目遮住同模型的命中
+            scores = self._vectors[:self._size] @ vector
+            scores[self._slot_models[:self._size] != code] = -np.inf
+            slot = int(np.argmax(scores))
+            score = float(scores[slot])
+            if score < self.config.threshold:
+                return None, vector
+            entry = self._entries.get(str(slot))
+            if not entry:
+                return None, vector
+            self._last_used[slot] = time.time()
+
+        logger.debug(f"语义缓存命中：score={score:.4f}")
+        return {**entry, 'score': score}, vector
+
+    def store(self, prompt: str, response: str, model: str, vector=None):
+        """写入缓存条目，容量已满时淘汰最久未命中的条目"""
+        if not self.enabled:
+            return
+        if vector is None:
+            try:
+                vector = self.embed(prompt)
+            except (RequestException, ValueError) as e:
+                logger.warning(f"语义缓存向量计算失败：{str(e)}")
+                return
+
+        with self._lock:
+            self._ensure_open()
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._allocate(vector.shape[0])
+            if self._size < self.config.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._last_used[slot] = time.time()
+            self._slot_models[slot] = self._model_code(model)
+            self._entries[str(slot)] = {'prompt': prompt, 'response': response, 'model': model}
+
+    def close(self):
+        """刷新并关闭当前进程打开的持久化文件，释放目录锁"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            if np is not None:
+                for array in (self._vectors, self._last_used):
+                    if isinstance(array, np.memmap):
+                        array.flush()
+            if hasattr(self._entries, 'close'):
+                self._entries.close()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self._pid = None
+            self._directory = None
+            self._reset()
@@ -0,0 +1,172 @@
+"""流式输出合并（上游响应块 -> 后台线程 -> 有界缓冲区 -> 合并为帧 -> HTTP响应）
+
+- 后台线程持续读取上游，上游读取不受客户端写出速度影响
+- 首个非空数据立即输出，之后按时间窗口或字节数合并为一帧，减少写出次数和HTTP分块数
+- 合并窗口随客户端消费速度自适应：每帧写出耗时越长，窗口越大（不超过上限）
+- 每个连接的缓冲区按字节数限制，超限说明客户端落后过多，停止读取上游（释放模型）并断开该客户端
+- 关闭（客户端断开、取消或超限）时中断后台线程阻塞中的上游读取并等待其退出，
+  调用方释放模型并发名额时上游连接已经关闭
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+CANCEL_POLL_INTERVAL = 0.1
+CLOSE_TIMEOUT = 5.0  # 关闭时等待后台线程退出的最长时间（秒）
+
+
+class SlowClientError(Exception):
+    """客户端消费过慢，缓冲区超出限制"""
+
+
+class StreamBuffer:
+    """在后台线程中读取字符串迭代器，放入按字节数限制的缓冲区
+
+    interrupt(线程)用于关闭时中断该线程中阻塞的上游读取（如LocalLLMClient.interrupt），
+    未提供时后台线程在收到下一个数据块后退出。
+    """
+
+    def __init__(self, source: Iterable[str], max_bytes: int = 256 * 1024,
+                 interrupt: Optional[Callable[[threading.Thread], object]] = None):
+        self.max_bytes = max_bytes
+        self._source = source
+        self._interrupt = interrupt
+        self._items = deque()
+        self._bytes = 0
+        self._condition = threading.Condition()
+        self._done = False
+        self._closed = False
+        self._overflow = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name='stream-buffer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        iterator = iter(self._source)
+        try:
+            for item in iterator:
+                size = len(item.encode('utf-8'))
+                with self._condition:
+                    if self._closed:
+                        break
+                    if self._bytes + size > self.max_bytes:
+                        self._overflow = True
+                        break
+                    self._items.append(item)
+                    self._bytes += size
+                    self._condition.notify()
+        except Exception as e:
+            self._error = e
+        finally:
+            # 关闭上游生成器（断开与模型服务的连接，停止生成）
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+            with self._condition:
+                self._done = True
+                self._condition.notify()
+
+    def take(self, timeout: Optional[float] = None) -> Optional[list[str]]:
+        """取出缓冲区中的全部数据
+
+        缓冲区为空时最多等待timeout秒（None表示一直等待），超时返回空列表；
+        上游结束且数据已全部取出时返回None。
+
+        Raises:
+            SlowClientError: 缓冲区超限
+            Exception: 上游读取时抛出的异常
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while not self._items and not self._done and not self._overflow:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+            if self._overflow:
+                raise SlowClientError(f"客户端消费过慢，缓冲区超过{self.max_bytes}字节")
+            if self._items:
+                items = list(self._items)
+                self._items.clear()
+                self._bytes = 0
+                return items
+            if self._error is not None:
+                raise self._error
+            return None
+
+    def close(self, timeout: float = CLOSE_TIMEOUT):
+        """停止读取上游，中断阻塞中的读取并等待后台线程退出（上游连接随之关闭）"""
+        with self._condition:
+            self._closed = True
+            self._items.clear()
+            self._bytes = 0
+            if self._done:
+                return
+        if self._interrupt is not None:
+            self._interrupt(self._thread)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"上游读取线程未在{timeout}秒内退出")
+
+
+def coalesce_frames(source: Iterable[str], window_ms: float = 20, max_window_ms: float = 200,
+                    frame_bytes: int = 4096, max_buffer_bytes: int = 256 * 1024,
+                    cancel: Optional[threading.Event] = None,
+                    interrupt: Optional[Callable[[threading.Thread], object]] = None) -> Iterator[str]:
+    """将字符串流合并为帧输出
+
+    Args:
+        source: 数据来源（在后台线程中迭代，不能依赖请求上下文）
+        window_ms: 最小合并窗口
+        max_window_ms: 最大合并窗口
+        frame_bytes: 帧达到该字节数时立即输出
+        max_buffer_bytes: 缓冲区上限，超出时抛出SlowClientError
+        cancel: 取消事件，置位后停止输出（等待上游期间也会定期检查）
+        interrupt: 关闭时中断后台线程中阻塞的上游读取（见StreamBuffer）
+    """
+    buffer = StreamBuffer(source, max_buffer_bytes, interrupt)
+    min_window = window_ms / 1000
+    max_window = max_window_ms / 1000
+    window = min_window
+    first = True
+    try:
+        while True:
+            items = buffer.take(None if cancel is None else CANCEL_POLL_INTERVAL)
+            while items == [] and not cancel.is_set():
+                items = buffer.take(CANCEL_POLL_INTERVAL)
+            if items is None or (cancel is not None and cancel.is_set()):
+                return
+            frame = ''.join(items)
+            size = len(frame.encode('utf-8'))
+
+            # 首帧立即输出，之后在窗口内继续收集，直到窗口结束或帧足够大
+            ended = False
+            if not first:
+                deadline = time.monotonic() + window
+                while size < frame_bytes:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    more = buffer.take(remaining)
+                    if more is None:
+                        ended = True
+                        break
+                    chunk = ''.join(more)
+                    frame += chunk
+                    size += len(chunk.encode('utf-8'))
+
+            if frame:
+                first = False
+                started = time.monotonic()
+                yield frame
+                # 本帧从交出到下次取数据的耗时近似客户端写出耗时，写出越慢合并窗口越大
+                drain = time.monotonic() - started
+                window = min(max_window, max(min_window, 0.5 * window + drain))
+            if ended:
+                return
+    finally:
+        buffer.close()
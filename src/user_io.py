@@ -0,0 +1,255 @@
+"""批量导入/导出用户（flask import-users / flask export-users）
+
+导入流程（按批处理）：
+- 流式读取CSV或JSONL，逐条校验字段，并在文件内按用户名、邮箱去重
+  （需记录已读取的全部用户名和邮箱，内存占用随文件中的用户数增长）
+- 每批用两条IN查询与数据库比对唯一性（逐条注册需要每个用户两次查询）
+- 密码在进程池中并行哈希（bcrypt为CPU密集型，线程受GIL限制无法利用多核）
+- 每批一次executemany插入、一次提交；与并发注册冲突时改为逐条插入，冲突的记录计为已存在
+
+输入字段：username、email、password（或导出得到的password_hash，用于迁移），可选tier。
+"""
+import csv
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice, repeat
+from typing import Callable, Iterator, Optional, TextIO
+
+import bcrypt as bcrypt_lib
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from src.models import User
+
+logger = logging.getLogger(__name__)
+
+# 与User模型的列长度保持一致
+USERNAME_MAX_LENGTH = 80
+EMAIL_MAX_LENGTH = 120
+TIER_MAX_LENGTH = 20
+PASSWORD_MIN_LENGTH = 8
+PASSWORD_MAX_BYTES = 72  # bcrypt只使用前72字节，超出时bcrypt库直接报错
+# 完整的bcrypt哈希：$2b$12$ + 22位盐 + 31位哈希值（bcrypt专用的base64字母表）
+BCRYPT_HASH_PATTERN = re.compile(r'\$2[abxy]?\$(0[4-9]|[12]\d|3[01])\$[./A-Za-z0-9]{53}')
+
+ERROR_SAMPLE_LIMIT = 20
+
+EXPORT_FIELDS = ['id', 'username', 'email', 'tier']
+
+
+def detect_format(path: str) -> str:
+    """按扩展名判断文件格式（.csv为CSV，其余按JSONL处理）"""
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def iter_user_records(path: str, fmt: Optional[str] = None) -> Iterator[tuple[int, Optional[dict]]]:
+    """逐条读取用户记录，返回(行号, 记录)；JSONL中的无效行返回None"""
+    fmt = fmt or detect_format(path)
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+
+
+def validate_user_record(record: Optional[dict]):
+    """校验一条用户记录，返回(是否有效, 规范化后的记录或错误信息)"""
+    if record is None:
+        return False, '无效的记录格式'
+
+    username, email, password, password_hash, tier = (
+        str(record.get(field) or '') for field in ('username', 'email', 'password', 'password_hash', 'tier')
+    )
+    username, email, password_hash = username.strip(), email.strip(), password_hash.strip()
+    tier = tier.strip() or 'free'
+
+    if not username:
+        return False, '缺少用户名'
+    if len(username) > USERNAME_MAX_LENGTH:
+        return False, f"用户名超过{USERNAME_MAX_LENGTH}个字符"
+    if not email or '@' not in email:
+        return False, '邮箱格式无效'
+    if len(email) > EMAIL_MAX_LENGTH:
+        return False, f"邮箱超过{EMAIL_MAX_LENGTH}个字符"
+    if len(tier) > TIER_MAX_LENGTH:
+        return False, f"用户等级超过{TIER_MAX_LENGTH}个字符"
+
+    if password:
+        if len(password) < PASSWORD_MIN_LENGTH:
+            return False, f"密码至少需要{PASSWORD_MIN_LENGTH}个字符"
+        if len(password.encode('utf-8')) > PASSWORD_MAX_BYTES:
+            return False, f"密码超过{PASSWORD_MAX_BYTES}字节"
+    elif not password_hash:
+        return False, '缺少密码'
+    elif not BCRYPT_HASH_PATTERN.fullmatch(password_hash):
+        return False, '密码哈希不是有效的bcrypt格式'
+
+    return True, {'username': username, 'email': email, 'tier': tier,
+                  'password': password, 'password_hash': password_hash}
+
+
+def hash_password(password: str, rounds: int = 12, prefix: str = '2b') -> str:
+    """在进程池中执行的密码哈希（结果与Flask-Bcrypt的generate_password_hash兼容）"""
+    salt = bcrypt_lib.gensalt(rounds=rounds, prefix=prefix.encode('ascii'))
+    return bcrypt_lib.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def find_existing(session, usernames: list[str], emails: list[str]) -> tuple[set, set]:
+    """批量查询数据库中已存在的用户名和邮箱"""
+    existing_names = set(session.scalars(select(User.username).where(User.username.in_(usernames))))
+    existing_emails = set(session.scalars(select(User.email).where(User.email.in_(emails))))
+    return existing_names, existing_emails
+
+
+def import_users(
+        session,
+        path: str,
+        fmt: Optional[str] = None,
+        batch_size: int = 1000,
+        workers: Optional[int] = None,
+        rounds: int = 12,
+        prefix: str = '2b',
+        dry_run: bool = False,
+        progress: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """从CSV/JSONL文件批量导入用户
+
+    Args:
+        session: 数据库会话
+        path: 输入文件
+        fmt: 'csv'或'jsonl'，默认按扩展名判断
+        batch_size: 每批处理的记录数（每批一个事务）
+        workers: 密码哈希进程数，默认为CPU核数
+        rounds: bcrypt计算轮数（BCRYPT_LOG_ROUNDS）
+        dry_run: 只校验，不哈希也不写入
+        progress: 进度回调，参数为统计字典
+
+    Returns:
+        统计字典：created、invalid、duplicate（文件内重复）、exists（数据库中已存在）、errors（前若干条错误）
+    """
+    stats = {'read': 0, 'created': 0, 'invalid': 0, 'duplicate': 0, 'exists': 0,
+             'errors': [], 'rate': 0.0, 'elapsed_seconds': 0.0}
+    seen_names, seen_emails = set(), set()
+    started = time.monotonic()
+
+    def reject(kind, line_no, message):
+        stats[kind] += 1
+        if len(stats['errors']) < ERROR_SAMPLE_LIMIT:
+            stats['errors'].append({'line': line_no, 'message': message})
+
+    def filter_existing(candidates):
+        """去掉数据库中已存在的用户"""
+        existing_names, existing_emails = find_existing(
+            session, [user['username'] for _, user in candidates], [user['email'] for _, user in candidates]
+        )
+        remaining = []
+        for line_no, user in candidates:
+            if user['username'] in existing_names:
+                reject('exists', line_no, f"用户名已存在：{user['username']}")
+            elif user['email'] in existing_emails:
+                reject('exists', line_no, f"邮箱已被注册：{user['email']}")
+            else:
+                remaining.append((line_no, user))
+        return remaining
+
+    records = iter_user_records(path, fmt)
+    workers = workers or os.cpu_count() or 1
+    # 只校验时不需要哈希，不创建进程池
+    with nullcontext() if dry_run else ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            stats['read'] += len(batch)
+
+            candidates = []
+            for line_no, record in batch:
+                is_valid, result = validate_user_record(record)
+                if not is_valid:
+                    reject('invalid', line_no, result)
+                elif result['username'] in seen_names or result['email'] in seen_emails:
+                    reject('duplicate', line_no, f"文件内重复：{result['username']} / {result['email']}")
+                else:
+                    seen_names.add(result['username'])
+                    seen_emails.add(result['email'])
+                    candidates.append((line_no, result))
+
+            if candidates:
+                candidates = filter_existing(candidates)
+            if candidates and not dry_run:
+                plain = [user['password'] for _, user in candidates if user['password']]
+                hashes = iter(executor.map(hash_password, plain, repeat(rounds), repeat(prefix),
+                                           chunksize=max(1, len(plain) // (4 * workers))))
+                rows = [{'username': user['username'], 'email': user['email'], 'tier': user['tier'],
+                         'password_hash': next(hashes) if user['password'] else user['password_hash']}
+                        for _, user in candidates]
+                try:
+                    session.execute(insert(User), rows)
+                    session.commit()
+                except IntegrityError:
+                    # 查询与插入之间有其他请求注册了同名用户：逐条插入，冲突的记录计为已存在
+                    session.rollback()
+                    inserted = []
+                    for (line_no, user), row in zip(candidates, rows):
+                        try:
+                            session.execute(insert(User), [row])
+                            session.commit()
+                        except IntegrityError:
+                            session.rollback()
+                            reject('exists', line_no, f"用户名或邮箱已存在：{user['username']} / {user['email']}")
+                        else:
+                            inserted.append((line_no, user))
+                    candidates = inserted
+            stats['created'] += len(candidates)
+
+            elapsed = time.monotonic() - started
+            stats['elapsed_seconds'] = elapsed
+            stats['rate'] = stats['read'] / elapsed if elapsed else 0.0
+            if progress:
+                progress(stats)
+
+    stats['elapsed_seconds'] = time.monotonic() - started
+    logger.info(f"批量导入用户完成：读取{stats['read']}条，新建{stats['created']}个，"
+                f"耗时{stats['elapsed_seconds']:.1f}s")
+    return stats
+
+
+def export_users(session, out: TextIO, fmt: str = 'jsonl', include_hashes: bool = False,
+                 batch_size: int = 1000) -> int:
+    """按id顺序流式导出用户，返回导出的用户数
+
+    include_hashes为True时同时导出password_hash（导出文件可直接用于import_users迁移，需妥善保管）。
+    """
+    fields = EXPORT_FIELDS + (['password_hash'] if include_hashes else [])
+    rows = session.execute(
+        select(*(getattr(User, field) for field in fields))
+        .order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    writer = csv.DictWriter(out, fieldnames=fields) if fmt == 'csv' else None
+    if writer is not None:
+        writer.writeheader()
+    count = 0
+    for row in rows:
+        record = row._asdict()
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
@@ -0,0 +1,223 @@
+"""WebSocket聊天通道（/ws/chat，需安装flask-sock）
+
+连接建立时通过Flask会话认证一次，之后同一连接上可并发进行多个对话，每条消息由客户端指定id。
+消息均为JSON文本：
+
+客户端 -> 服务端：
+- {"type": "chat", "id": "m1", "message": "...", "conversation_id": 1, "mode": "fast", "include_thinking": false}
+- {"type": "cancel", "id": "m1"}
+- {"type": "ping"}
+
+服务端 -> 客户端（同一帧可能包含多行，每行一个JSON事件）：
+- {"type": "ready", "user_id": 1}
+- {"id": "m1", "type": "thinking" | "answer", "content": "..."}
+- {"id": "m1", "type": "done", "model": "...", "conversation_id": 1}
+- {"id": "m1", "type": "error" | "cancelled", ...}
+- {"type": "pong"}
+
+协议层心跳由simple-websocket按WEBSOCKET_PING_INTERVAL发送ping帧完成。
+
+WebSocket握手不受同源策略限制，浏览器会携带Cookie，因此握手前检查Origin：
+只接受与本站同源或在WEBSOCKET_ALLOWED_ORIGINS中的来源（防止跨站WebSocket劫持）。
+"""
+import json
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from flask import current_app, jsonify, request, session
+
+from src.routers import ChatTurn, ndjson_line, stream_chat_events, validate_chat_request
+
+try:  # 可选依赖
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:  # pragma: no cover
+    Sock = None
+    ConnectionClosed = None
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSocket:
+    """单个WebSocket连接：接收循环在连接线程中运行，每条聊天消息在独立的工作线程中生成"""
+
+    def __init__(self, ws, app, user_id, tier, max_inflight=4):
+        self.ws = ws
+        self.app = app
+        self.user_id = user_id
+        self.tier = tier
+        self.max_inflight = max_inflight
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._inflight = {}  # 消息id -> 取消事件
+        self._closed = threading.Event()
+
+    def send(self, data):
+        """发送一帧（多个工作线程共用连接，需要加锁）"""
+        if self._closed.is_set():
+            return False
+        try:
+            with self._send_lock:
+                self.ws.send(data)
+            return True
+        except ConnectionClosed:
+            self.close()
+            return False
+
+    def send_event(self, event, message_id=None):
+        if message_id is not None:
+            event = {'id': message_id, **event}
+        return self.send(ndjson_line(event))
+
+    def close(self):
+        """连接断开时取消所有进行中的生成"""
+        self._closed.set()
+        with self._lock:
+            for cancel in self._inflight.values():
+                cancel.set()
+
+    def serve(self):
+        self.send_event({'type': 'ready', 'user_id': self.user_id})
+        try:
+            while not self._closed.is_set():
+                raw = self.ws.receive()
+                if raw is None:
+                    break
+                self.handle(raw)
+        finally:
+            self.close()
+
+    def handle(self, raw):
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            self.send_event({'type': 'error', 'message': '消息格式无效'})
+            return
+        if not isinstance(data, dict):
+            self.send_event({'type': 'error', 'message': '消息格式无效'})
+            return
+
+        kind = data.get('type')
+        message_id = data.get('id')
+        if kind == 'ping':
+            self.send_event({'type': 'pong'})
+        elif kind == 'cancel':
+            with self._lock:
+                cancel = self._inflight.get(message_id)
+            if cancel is not None:
+                cancel.set()
+        elif kind == 'chat':
+            self.start_chat(message_id, data)
+        else:
+            self.send_event({'type': 'error', 'message': f"未知的消息类型：{kind}"}, message_id)
+
+    def start_chat(self, message_id, data):
+        if not isinstance(message_id, (str, int)) or isinstance(message_id, bool):
+            self.send_event({'type': 'error', 'message': '缺少消息id'})
+            return
+        is_valid, message_data = validate_chat_request(data)
+        if not is_valid:
+            self.send_event({'type': 'error', 'message': message_data}, message_id)
+            return
+
+        cancel = threading.Event()
+        with self._lock:
+            if message_id in self._inflight:
+                error = '消息id重复'
+            elif len(self._inflight) >= self.max_inflight:
+                error = f"同一连接最多同时进行{self.max_inflight}个对话"
+            else:
+                error = None
+                self._inflight[message_id] = cancel
+        if error:
+            self.send_event({'type': 'error', 'message': error}, message_id)
+            return
+
+        threading.Thread(
+            target=self.run_chat, args=(message_id, message_data, cancel),
+            name=f"ws-chat-{message_id}", daemon=True
+        ).start()
+
+    def run_chat(self, message_id, message_data, cancel):
+        """在工作线程中生成回复（需要单独推入应用上下文，数据库会话随上下文隔离）"""
+        try:
+            with self.app.app_context():
+                turn = ChatTurn(message_data, self.user_id, self.tier)
+                error = turn.load()
+                if error:
+                    self.send_event({'type': 'error', 'message': error[0]}, message_id)
+                    return
+
+                cached = turn.lookup_cache()
+                if cached:
+                    extra = turn.finish(cached['response'])
+                    self.send(ndjson_line({'id': message_id, 'type': 'answer', 'content': cached['response']})
+                              + ndjson_line({'id': message_id, 'type': 'done', 'model': turn.model_name,
+                                             'cached': True, **extra}))
+                    return
+
+                events = stream_chat_events(
+                    turn.route, turn.messages,
+                    include_thinking=message_data['include_thinking'],
+                    on_complete=turn.finish,
+                    user=self.user_id,
+                    request_chunks=lambda client: turn.request_chunks(client, stream=True),
+                    render_event=lambda event: ndjson_line({'id': message_id, **event}),
+                    cancel=cancel
+                )
+                try:
+                    for frame in events:
+                        if not self.send(frame):
+                            cancel.set()
+                finally:
+                    events.close()
+        except Exception as e:
+            logger.error(f"WebSocket对话失败: {str(e)}", exc_info=True)
+            self.send_event({'type': 'error', 'message': '处理请求时发生内部错误'}, message_id)
+        finally:
+            with self._lock:
+                self._inflight.pop(message_id, None)
+
+
+def origin_allowed(origin, host, allowed_origins=()):
+    """检查握手请求的Origin是否与host同源或在允许列表中（未携带Origin的非浏览器客户端不受限制）"""
+    if not origin:
+        return True
+    if origin.rstrip('/') in {item.rstrip('/') for item in allowed_origins}:
+        return True
+    parts = urlsplit(origin)
+    return parts.scheme in ('http', 'https') and parts.netloc.lower() == host.lower()
+
+
+def init_websocket(app):
+    """注册/ws/chat路由（未安装flask-sock或WEBSOCKET_ENABLED为False时不启用）"""
+    if not app.config.get('WEBSOCKET_ENABLED', True):
+        return
+    if Sock is None:
+        logger.warning("未安装flask-sock，WebSocket聊天通道已禁用")
+        return
+
+    app.config.setdefault('SOCK_SERVER_OPTIONS', {'ping_interval': app.config.get('WEBSOCKET_PING_INTERVAL', 25)})
+    sock = Sock(app)
+
+    @app.before_request
+    def check_websocket_origin():
+        if request.endpoint != 'chat_socket':
+            return None
+        origin = request.headers.get('Origin')
+        if not origin_allowed(origin, request.host, current_app.config.get('WEBSOCKET_ALLOWED_ORIGINS', [])):
+            logger.warning(f"拒绝跨站WebSocket连接：{origin}")
+            return jsonify({'status': 'error', 'message': '不允许的来源'}), 403
+        return None
+
+    @sock.route('/ws/chat')
+    def chat_socket(ws):
+        user_id = session.get('user_id')
+        if not user_id:
+            ws.close(reason=1008, message='请先登录')
+            return
+        ChatSocket(
+            ws, current_app._get_current_object(), user_id, session.get('tier'),
+            max_inflight=current_app.config.get('WEBSOCKET_MAX_INFLIGHT', 4)
+        ).serve()
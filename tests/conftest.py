@@ -0,0 +1,87 @@
+import pytest
+
+from app import create_app
+from src.dk_client import LocalLLMClient
+from src.extensions import db
+from src.models import User
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SEMANTIC_CACHE_ENABLED': False,
+        'SLOW_REQUEST_MS': None,
+        'BCRYPT_LOG_ROUNDS': 4,
+    })
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(username='alice', email='alice@example.com', tier='free')
+        user.set_password('password1')
+        db.session.add(user)
+        db.session.commit()
+        return {'id': user.id, 'username': user.username, 'tier': user.tier}
+
+
+@pytest.fixture
+def logged_in(client, user):
+    with client.session_transaction() as session:
+        session['user_id'] = user['id']
+        session['username'] = user['username']
+        session['tier'] = user['tier']
+    return client
+
+
+class FakeLLM:
+    """替换LocalLLMClient的请求方法，记录请求并返回预设回复"""
+
+    def __init__(self):
+        self.reply = '<think>思考</think>回答'
+        self.calls = []
+        self.context = [1, 2, 3]
+
+    def generate(self, client, messages, stream=False, **kwargs):
+        self.calls.append({'api': 'chat', 'model': client.config.model_name, 'messages': messages,
+                           'stream': stream, **kwargs})
+        if stream:
+            for piece in self.reply:
+                yield {'message': {'role': 'assistant', 'content': piece}, 'done': False}
+            yield {'message': {'role': 'assistant', 'content': ''}, 'done': True}
+        else:
+            yield {'message': {'role': 'assistant', 'content': self.reply}, 'done': True,
+                   'model': client.config.model_name}
+
+    def generate_incremental(self, client, prompt, context=None, stream=False, **kwargs):
+        self.calls.append({'api': 'generate', 'prompt': prompt, 'context': context, 'stream': stream})
+        final = {'message': {'role': 'assistant', 'content': '' if stream else self.reply}, 'done': True,
+                 'context': list(self.context)}
+        if stream:
+            for piece in self.reply:
+                yield {'message': {'role': 'assistant', 'content': piece}, 'done': False}
+        yield final
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(LocalLLMClient, 'generate',
+                        lambda self, messages, stream=False, **kw: fake.generate(self, messages, stream, **kw))
+    monkeypatch.setattr(LocalLLMClient, 'generate_incremental',
+                        lambda self, prompt, context=None, stream=False, **kw:
+                        fake.generate_incremental(self, prompt, context, stream, **kw))
+    return fake
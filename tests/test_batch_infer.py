@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+from src.batch_infer import CheckpointMismatchError, run_batch_inference
+
+
+class FakeClient:
+    """按提示词返回回复；available为False时模拟模型服务不可用"""
+
+    def __init__(self):
+        self.available = True
+        self.prompts = []
+
+        class Config:
+            model_name = 'fake'
+        self.config = Config()
+
+    def generate(self, messages, **kwargs):
+        prompt = messages[-1]['content']
+        self.prompts.append(prompt)
+        if not self.available:
+            raise ConnectionError('服务不可用')
+        yield {'message': {'role': 'assistant', 'content': f"答:{prompt}"}}
+
+
+def write_input(path, ids):
+    with open(path, 'w', encoding='utf-8') as f:
+        for request_id in ids:
+            f.write(json.dumps({'id': request_id, 'prompt': f"q{request_id}"}) + '\n')
+
+
+def read_results(path):
+    """按行号保留最后一条结果"""
+    results = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            result = json.loads(line)
+            results[result['line']] = result
+    return results
+
+
+def test_resume_retries_lines_that_failed(tmp_path):
+    input_path, output_path = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_input(input_path, range(20))
+    client = FakeClient()
+
+    client.available = False
+    stats = run_batch_inference(client, str(input_path), str(output_path), concurrency=3, checkpoint_every=5)
+    assert stats['failed'] == 20 and stats['succeeded'] == 0
+
+    client.available = True
+    stats = run_batch_inference(client, str(input_path), str(output_path), concurrency=3, checkpoint_every=5)
+    assert stats['succeeded'] == 20 and stats['skipped'] == 0 and stats['retried'] == 20
+
+    results = read_results(output_path)
+    assert all(results[line]['status'] == 'success' for line in range(20))
+
+    client.prompts.clear()
+    stats = run_batch_inference(client, str(input_path), str(output_path))
+    assert stats['skipped'] == 20 and client.prompts == []
+
+
+def test_no_retry_failed_keeps_failures(tmp_path):
+    input_path, output_path = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_input(input_path, range(5))
+    client = FakeClient()
+    client.available = False
+    run_batch_inference(client, str(input_path), str(output_path))
+
+    client.available = True
+    stats = run_batch_inference(client, str(input_path), str(output_path), retry_failed=False)
+    assert stats['skipped'] == 5 and stats['succeeded'] == 0
+
+
+def test_resume_only_reads_results_after_checkpoint(tmp_path):
+    input_path, output_path = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_input(input_path, range(6))
+    client = FakeClient()
+    run_batch_inference(client, str(input_path), str(output_path))
+
+    # 检查点之前的内容不再解析：写入无法解析的前缀不影响续跑
+    content = output_path.read_bytes()
+    output_path.write_bytes(b'x' * (len(content) - 1) + b'\n')
+    stats = run_batch_inference(client, str(input_path), str(output_path))
+    assert stats['skipped'] == 6
+
+
+def test_resume_rejects_reordered_input(tmp_path):
+    input_path, output_path = tmp_path / 'in.jsonl', tmp_path / 'out.jsonl'
+    write_input(input_path, range(10))
+    client = FakeClient()
+    run_batch_inference(client, str(input_path), str(output_path))
+
+    write_input(input_path, reversed(range(10)))
+    with pytest.raises(CheckpointMismatchError):
+        run_batch_inference(client, str(input_path), str(output_path))
+
+
+def test_rejects_invalid_concurrency(tmp_path):
+    input_path = tmp_path / 'in.jsonl'
+    write_input(input_path, range(1))
+    with pytest.raises(ValueError):
+        run_batch_inference(FakeClient(), str(input_path), str(tmp_path / 'out.jsonl'), concurrency=0)
+
+
+def test_cli_rejects_zero_concurrency(app, tmp_path):
+    input_path = tmp_path / 'in.jsonl'
+    write_input(input_path, range(1))
+    result = app.test_cli_runner().invoke(
+        args=['batch-infer', str(input_path), str(tmp_path / 'out.jsonl'), '--concurrency', '0']
+    )
+    assert result.exit_code != 0
+    assert not (tmp_path / 'out.jsonl').exists()
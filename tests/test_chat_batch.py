@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+
+from src.dk_client import LocalLLMClient
+
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_batch_returns_every_item_and_summary(client, fake_llm):
+    response = client.post('/api/chat/batch', json={'prompts': ['问题1', '问题2', '问题3']})
+
+    assert response.status_code == 200
+    lines = read_ndjson(response)
+    results, summary = lines[:-1], lines[-1]['summary']
+    assert sorted(r['index'] for r in results) == [0, 1, 2]
+    assert all(r['status'] == 'success' and r['response'] == '回答' for r in results)
+    assert summary['total'] == 3 and summary['succeeded'] == 3 and summary['failed'] == 0
+
+
+def test_batch_parallelism_is_bounded(app, client, monkeypatch):
+    app.config['BATCH_MAX_PARALLEL'] = 2
+    running = peak = 0
+    lock = threading.Lock()
+
+    def slow_generate(self, messages, stream=False, **kwargs):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        yield {'message': {'role': 'assistant', 'content': 'ok'}}
+
+    monkeypatch.setattr(LocalLLMClient, 'generate', slow_generate)
+    response = client.post('/api/chat/batch', json={'prompts': [f"q{i}" for i in range(6)], 'parallelism': 10})
+
+    summary = read_ndjson(response)[-1]['summary']
+    assert summary['succeeded'] == 6
+    assert summary['parallelism'] == 2
+    assert peak <= 2
+
+
+def test_batch_item_failure_does_not_abort_batch(client, monkeypatch):
+    def flaky_generate(self, messages, stream=False, **kwargs):
+        if messages[-1]['content'] == 'bad':
+            raise RuntimeError('boom')
+        yield {'message': {'role': 'assistant', 'content': 'ok'}}
+
+    monkeypatch.setattr(LocalLLMClient, 'generate', flaky_generate)
+    lines = read_ndjson(client.post('/api/chat/batch', json={'prompts': ['good', 'bad']}))
+
+    by_index = {line['index']: line for line in lines[:-1]}
+    assert by_index[0]['status'] == 'success'
+    assert by_index[1]['status'] == 'error'
+    assert lines[-1]['summary']['failed'] == 1
+
+
+def test_batch_rejects_invalid_payload(client):
+    assert client.post('/api/chat/batch', json={'items': []}).status_code == 400
+    assert client.post('/api/chat/batch', json={'items': [{'message': ''}]}).status_code == 400
+
+
+def test_batch_rejects_invalid_options_and_empty_messages(client, fake_llm):
+    for options in ('abc', [1, 2], 3):
+        response = client.post('/api/chat/batch', json={'items': [{'message': 'hi', 'options': options}]})
+        assert response.status_code == 400
+        assert 'options' in response.get_json()['message']
+
+    response = client.post('/api/chat/batch', json={'items': [{'messages': []}]})
+    assert response.status_code == 400
+    assert fake_llm.calls == []
+
+
+def test_rejected_batch_does_not_count_route_selection(client, logged_in, fake_llm):
+    def selected():
+        routes = logged_in.get('/api/routing/stats').get_json()['routes']
+        return sum(route['selected'] for route in routes.values())
+
+    before = selected()
+    response = client.post('/api/chat/batch', json={'items': [{'message': 'ok'}, {'message': 'ok', 'options': 'x'}]})
+    assert response.status_code == 400
+    assert selected() == before
+
+    client.post('/api/chat/batch', json={'items': [{'message': 'ok'}, {'message': 'ok'}]})
+    assert selected() == before + 2
@@ -0,0 +1,65 @@
+import gzip
+import json
+import zlib
+
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from app import create_app
+from src.compression import compress_stream, negotiate_encoding
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+def test_negotiate_encoding_follows_server_preference():
+    assert negotiate_encoding(accept('gzip, br'), ['br', 'gzip']) in ('br', 'gzip')
+    assert negotiate_encoding(accept('gzip'), ['br', 'zstd', 'gzip']) == 'gzip'
+    assert negotiate_encoding(accept('gzip;q=0, identity'), ['gzip']) is None
+    assert negotiate_encoding(accept('unknown'), ['unknown', 'gzip']) is None
+
+
+def test_stream_chunks_decode_immediately():
+    decoder = zlib.decompressobj(31)
+    chunks = compress_stream(iter([b'first ', b'second']), 'gzip')
+
+    assert decoder.decompress(next(chunks)) == b'first '
+    assert decoder.decompress(next(chunks)) == b'second'
+    for tail in chunks:
+        decoder.decompress(tail)
+    assert decoder.eof
+
+
+def test_large_response_uses_configured_algorithm(tmp_path):
+    # init_compression在创建应用时读取配置，需在create_app时传入
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SEMANTIC_CACHE_ENABLED': False,
+        'SLOW_REQUEST_MS': None,
+        'COMPRESS_ALGORITHMS': ['gzip'],
+    })
+    response = app.test_client().get('/login', headers={'Accept-Encoding': 'br, zstd, gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'<html' in gzip.decompress(response.get_data()).lower()
+
+
+def test_streamed_chat_is_gzipped(client, fake_llm):
+    response = client.post('/api/chat', json={'message': 'hi', 'stream': True},
+                           headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = [json.loads(line) for line in gzip.decompress(response.get_data()).splitlines() if line]
+    assert lines[-1]['type'] == 'done'
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.get('/healthz', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert len(response.get_data()) < client.application.config['COMPRESS_MIN_SIZE']
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['status'] == 'ok'
@@ -0,0 +1,84 @@
+import src.routers
+from src.extensions import db
+from src.models import MESSAGE_COMPRESS_THRESHOLD, Conversation, Message
+
+
+def test_long_messages_are_stored_compressed(app, user):
+    with app.app_context():
+        conversation = Conversation(user_id=user['id'], message_count=0)
+        db.session.add(conversation)
+        db.session.flush()
+        long_text = '量子纠缠' * MESSAGE_COMPRESS_THRESHOLD
+        message = Message(conversation_id=conversation.id, role='user', content=long_text)
+        short = Message(conversation_id=conversation.id, role='user', content='短消息')
+        db.session.add_all([message, short])
+        db.session.commit()
+
+        assert message.compressed and len(message.body) < len(long_text.encode('utf-8'))
+        assert not short.compressed
+        db.session.expire_all()
+        assert db.session.get(Message, message.id).content == long_text
+
+
+def test_follow_up_turn_sends_history_without_reasoning(app, logged_in, fake_llm):
+    app.config['INCREMENTAL_PREFILL'] = False
+    first = logged_in.post('/api/chat', json={'message': '第一问'}).get_json()
+    conversation_id = first['conversation_id']
+
+    logged_in.post('/api/chat', json={'message': '第二问', 'conversation_id': conversation_id})
+
+    assert fake_llm.calls[-1]['messages'] == [
+        {'role': 'user', 'content': '第一问'},
+        {'role': 'assistant', 'content': '回答'},
+        {'role': 'user', 'content': '第二问'},
+    ]
+    messages = logged_in.get(f"/api/conversations/{conversation_id}/messages?limit=2").get_json()
+    assert [m['content'] for m in messages['messages']] == ['第二问', '回答']
+    assert messages['next_before'] is not None
+
+
+def test_conversations_are_private(app, client, logged_in, fake_llm):
+    conversation_id = logged_in.post('/api/chat', json={'message': '你好'}).get_json()['conversation_id']
+    with logged_in.session_transaction() as session:
+        session['user_id'] = 999
+
+    assert logged_in.get(f"/api/conversations/{conversation_id}/messages").status_code == 404
+    assert logged_in.post('/api/chat', json={'message': 'x', 'conversation_id': conversation_id}).status_code == 404
+
+
+def test_incremental_prefill_reuses_context_without_loading_history(app, logged_in, fake_llm, monkeypatch):
+    app.config['INCREMENTAL_PREFILL'] = True
+    fake_llm.reply = '回答'
+    conversation_id = logged_in.post('/api/chat', json={'message': '第一问'}).get_json()['conversation_id']
+
+    def fail_load_history(*args):
+        raise AssertionError('复用context时不应加载历史')
+
+    monkeypatch.setattr(src.routers, 'load_history', fail_load_history)
+    response = logged_in.post('/api/chat', json={'message': '第二问', 'conversation_id': conversation_id})
+
+    assert response.status_code == 200
+    assert fake_llm.calls[-1] == {'api': 'generate', 'prompt': '第二问', 'context': [1, 2, 3], 'stream': False}
+
+
+def test_incremental_prefill_discards_context_with_reasoning(app, logged_in, fake_llm):
+    app.config['INCREMENTAL_PREFILL'] = True
+    conversation_id = logged_in.post('/api/chat', json={'message': '第一问'}).get_json()['conversation_id']
+    assert fake_llm.calls[-1] == {'api': 'generate', 'prompt': '第一问', 'context': None, 'stream': False}
+    with app.app_context():
+        assert db.session.get(Conversation, conversation_id).llm_context is None
+
+    # 没有可复用的context时通过/api/chat发送去掉思考过程的历史
+    logged_in.post('/api/chat', json={'message': '第二问', 'conversation_id': conversation_id, 'stream': True})
+
+    call = fake_llm.calls[-1]
+    assert call['api'] == 'chat' and call['messages'] == [
+        {'role': 'user', 'content': '第一问'},
+        {'role': 'assistant', 'content': '回答'},
+        {'role': 'user', 'content': '第二问'},
+    ]
+
+
+def test_incremental_prefill_is_off_by_default(app, logged_in, fake_llm):
+    logged_in.post('/api/chat', json={'message': '第一问'})
+    assert fake_llm.calls[-1]['api'] == 'chat'
@@ -0,0 +1,61 @@
+import pytest
+
+from app import create_app
+from src.extensions import health_prober
+
+
+class FakeResponse:
+    def __init__(self, models):
+        self.models = models
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'models': [{'name': name} for name in self.models]}
+
+
+@pytest.fixture
+def routed_app(tmp_path, monkeypatch):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SEMANTIC_CACHE_ENABLED': False,
+        'SLOW_REQUEST_MS': None,
+        'DEFAULT_MODEL': 'deepseek-r1:1.5b',
+        'MODEL_ROUTES': {'fast': {'model_name': 'qwen2:0.5b'}, 'large': {'model_name': 'qwen2:7b'}},
+    })
+    installed = {'qwen2:0.5b', 'qwen2:7b'}
+    loaded = {'qwen2:0.5b'}
+    monkeypatch.setattr(health_prober._session, 'get',
+                        lambda url, timeout=None: FakeResponse(installed if url.endswith('/api/tags') else loaded))
+    app.installed = installed
+    yield app
+    health_prober.stop()
+
+
+def test_ready_when_route_models_are_installed(routed_app):
+    health_prober.probe()
+    assert health_prober.readiness() == (True, [])
+
+    response = routed_app.test_client().get('/readyz')
+    assert response.status_code == 200
+
+
+def test_missing_route_model_is_reported(routed_app):
+    routed_app.installed.discard('qwen2:7b')
+    health_prober.probe()
+    assert health_prober.readiness() == (False, ['model_missing:qwen2:7b'])
+
+
+def test_require_loaded(routed_app):
+    health_prober.require_loaded = True
+    health_prober.probe()
+    assert health_prober.readiness() == (False, ['model_not_loaded:qwen2:7b'])
+
+
+def test_draining_is_not_ready(routed_app):
+    health_prober.probe()
+    health_prober.mark_draining()
+    ready, reasons = health_prober.readiness()
+    assert not ready and reasons == ['draining']
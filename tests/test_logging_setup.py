@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+import time
+
+from src.logging_setup import JsonFormatter, NonBlockingQueueHandler, RateLimitFilter
+
+
+def make_record(message='消息', lineno=10, level=logging.WARNING, **extra):
+    record = logging.LogRecord('test', level, __file__, lineno, message, (), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_queue_handler_drops_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record('1'))
+    handler.handle(make_record('2'))
+
+    assert handler.queue.qsize() == 1 and handler.dropped == 1
+
+
+def test_rate_limit_reports_suppressed_count():
+    rate_limit = RateLimitFilter(window=0.05, burst=2)
+    assert [rate_limit.filter(make_record()) for _ in range(4)] == [True, True, False, False]
+    assert rate_limit.filter(make_record(lineno=11))  # 其他代码位置不受影响
+    assert rate_limit.filter(make_record(level=logging.INFO))
+
+    time.sleep(0.06)
+    record = make_record()
+    assert rate_limit.filter(record) and record.suppressed == 2
+
+
+def test_json_formatter_includes_extra_fields():
+    data = json.loads(JsonFormatter().format(make_record('完成', request_id='abc', user_id=7)))
+    assert data['message'] == '完成' and data['request_id'] == 'abc' and data['user_id'] == 7
+    assert data['level'] == 'WARNING'
+
+
+def test_request_id_is_echoed_or_generated(client):
+    response = client.get('/login', headers={'X-Request-ID': 'req-1'})
+    assert response.headers['X-Request-ID'] == 'req-1'
+
+    generated = client.get('/login').headers['X-Request-ID']
+    assert generated and generated != 'req-1'
@@ -0,0 +1,55 @@
+import pytest
+
+from app import create_app
+from src.extensions import model_router
+
+
+@pytest.fixture
+def routed_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SEMANTIC_CACHE_ENABLED': False,
+        'SLOW_REQUEST_MS': None,
+        'MODEL_ROUTES': {
+            'fast': {'model_name': 'small-model'},
+            'large': {'model_name': 'large-model'},
+        },
+        'MODEL_ROUTING_RULES': [
+            {'route': 'large', 'mode': 'deep'},
+            {'route': 'large', 'tiers': ['pro']},
+        ],
+        'MODEL_DEFAULT_ROUTE': 'fast',
+    })
+    return app
+
+
+def test_select_by_mode_and_tier(routed_app):
+    assert model_router.select('hi') == 'fast'
+    assert model_router.select('hi', mode='deep') == 'large'
+    assert model_router.select('hi', mode='large') == 'large'
+    assert model_router.select('hi', tier='pro') == 'large'
+
+
+def test_select_rejects_non_string_mode(routed_app):
+    with pytest.raises(ValueError):
+        model_router.select('hi', mode=[])
+    with pytest.raises(ValueError):
+        model_router.select('hi', tier={'a': 1})
+
+
+def test_chat_rejects_non_string_mode(client, fake_llm):
+    response = client.post('/api/chat', json={'message': 'hi', 'mode': []})
+    assert response.status_code == 400
+
+    response = client.post('/api/chat/batch', json={'items': [{'message': 'hi', 'mode': {}}]})
+    assert response.status_code == 400
+
+
+def test_routing_stats_requires_login(client, logged_in):
+    anonymous = client.application.test_client()
+    assert anonymous.get('/api/routing/stats').status_code == 401
+
+    response = logged_in.get('/api/routing/stats')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'success'
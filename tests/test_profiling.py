@@ -0,0 +1,67 @@
+import logging
+import time
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.extensions import db
+from src.profiling import PHASE_DB, PHASE_UPSTREAM_STREAM, PHASE_UPSTREAM_WAIT, timed_upstream
+
+
+def slow_chunks():
+    time.sleep(0.03)
+    yield 'a'
+    time.sleep(0.01)
+    yield 'b'
+
+
+def test_timed_upstream_splits_wait_and_stream(app):
+    with app.test_request_context():
+        g._phases = {}
+        items = []
+        for item in timed_upstream(slow_chunks()):
+            items.append(item)
+            time.sleep(0.05)  # 下游消费耗时不计入上游阶段
+
+        assert items == ['a', 'b']
+        assert 0.03 <= g._phases[PHASE_UPSTREAM_WAIT] < 0.05
+        assert 0.01 <= g._phases[PHASE_UPSTREAM_STREAM] < 0.05
+
+
+def test_timed_upstream_outside_request_is_ignored():
+    assert list(timed_upstream(iter([1, 2]))) == [1, 2]
+
+
+def test_slow_request_log_includes_phases(app, client, fake_llm, caplog):
+    app.config['SLOW_REQUEST_MS'] = 0
+    with caplog.at_level(logging.WARNING, logger='src.profiling'):
+        assert client.post('/api/chat', json={'message': 'hi'}).status_code == 200
+
+    messages = [record.getMessage() for record in caplog.records if record.name == 'src.profiling']
+    assert any('慢请求：POST /api/chat' in message and PHASE_UPSTREAM_WAIT in message for message in messages)
+
+
+def test_profile_token_writes_profile(app, client, tmp_path):
+    app.config.update(PROFILE_TOKEN='secret', PROFILE_DIR=str(tmp_path / 'profiles'))
+    client.get('/login', headers={'X-Profile': 'wrong'})
+    assert not (tmp_path / 'profiles').exists()
+
+    client.get('/login', headers={'X-Profile': 'secret'})
+    assert [path.suffix for path in (tmp_path / 'profiles').iterdir()] == ['.prof']
+
+
+def test_failed_query_does_not_leak_start_time(app):
+    with app.test_request_context(), db.engine.connect() as connection:
+        g._phases = {}
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text('SELECT * FROM missing_table'))
+            connection.rollback()
+        time.sleep(0.05)
+        g._phases = {}
+        connection.execute(text('SELECT 1'))
+
+        assert '_query_started' not in connection.info
+        assert g._phases[PHASE_DB] < 0.05
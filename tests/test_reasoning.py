@@ -0,0 +1,54 @@
+import json
+
+from src.dk_client import ReasoningSplitter, split_reasoning, strip_reasoning
+
+
+def collect(parts):
+    result = {'thinking': '', 'answer': ''}
+    for channel, text in parts:
+        result[channel] += text
+    return result
+
+
+def test_splitter_handles_tags_split_across_chunks():
+    splitter = ReasoningSplitter()
+    parts = []
+    for piece in ['<th', 'ink>先想', '一想</th', 'ink>\n\n', '结论', '']:
+        parts += splitter.feed(piece)
+    parts += splitter.flush()
+
+    assert collect(parts) == {'thinking': '先想一想', 'answer': '结论'}
+
+
+def test_splitter_reads_separate_thinking_field():
+    splitter = ReasoningSplitter()
+    parts = splitter.feed_chunk({'message': {'thinking': '思考', 'content': '回答'}}) + splitter.flush()
+    assert collect(parts) == {'thinking': '思考', 'answer': '回答'}
+
+
+def test_split_and_strip_reasoning():
+    assert split_reasoning('<think>a</think>b') == ('a', 'b')
+    assert split_reasoning('no tags') == ('', 'no tags')
+    history = [{'role': 'user', 'content': '<think>用户原文</think>'},
+               {'role': 'assistant', 'content': '<think>x</think>答'}]
+    assert strip_reasoning(history) == [history[0], {'role': 'assistant', 'content': '答'}]
+
+
+def test_chat_hides_thinking_unless_requested(client, fake_llm):
+    plain = client.post('/api/chat', json={'message': '你好'}).get_json()
+    assert plain['response'] == '回答'
+    assert 'thinking' not in plain
+
+    detailed = client.post('/api/chat', json={'message': '你好', 'include_thinking': True}).get_json()
+    assert detailed['thinking'] == '思考'
+
+
+def test_stream_separates_channels(client, fake_llm):
+    response = client.post('/api/chat', json={'message': '你好', 'stream': True, 'include_thinking': True})
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+    text = {'thinking': '', 'answer': ''}
+    for event in events[:-1]:
+        text[event['type']] += event['content']
+    assert text == {'thinking': '思考', 'answer': '回答'}
+    assert events[-1]['type'] == 'done'
@@ -0,0 +1,47 @@
+import os
+import signal
+
+import src.logging_setup as logging_setup
+from src.extensions import health_prober, model_router
+from src.runtime import init_worker, install_drain_handler
+
+
+def test_drain_handler_marks_unready_and_chains_previous(app):
+    calls = []
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: calls.append(signum))
+    try:
+        install_drain_handler()
+        health_prober.probe()
+        assert 'draining' not in health_prober.readiness()[1]
+
+        os.kill(os.getpid(), signal.SIGTERM)
+
+        assert calls == [signal.SIGTERM]
+        assert 'draining' in health_prober.readiness()[1]
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def test_listener_uses_new_queue_after_fork(app):
+    handler = logging_setup._queue_handler
+    parent_listener, parent_queue = logging_setup._listener, handler.queue
+    logging_setup._listener_pid = -1  # 模拟fork：监听线程属于父进程
+    try:
+        logging_setup.start_listener()
+
+        assert handler.queue is not parent_queue
+        assert handler.queue.maxsize == parent_queue.maxsize
+        assert logging_setup._listener is not parent_listener and logging_setup._listener_pid == os.getpid()
+    finally:
+        parent_listener.stop()
+
+
+def test_init_worker_rebuilds_model_clients(app):
+    previous = signal.getsignal(signal.SIGTERM)
+    clients = {route: model_router.client(route) for route in model_router.routes}
+    try:
+        init_worker(app)
+        assert all(model_router.client(route) is not client for route, client in clients.items())
+    finally:
+        health_prober.stop()
+        signal.signal(signal.SIGTERM, previous)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from src.scheduler import (FairScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE, SchedulerFullError,
+                           SchedulerTimeoutError)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, '等待超时'
+        time.sleep(0.001)
+
+
+def run_queued(scheduler, requests):
+    """占用唯一名额后按顺序排队requests，释放后返回实际放行顺序"""
+    order = []
+    scheduler.wait_for_slot('holder')
+
+    def worker(name, user, priority):
+        scheduler.wait_for_slot(user, priority, timeout=5)
+        order.append(name)
+        scheduler.release()
+
+    threads = []
+    for name, user, priority in requests:
+        queued = scheduler.queued
+        thread = threading.Thread(target=worker, args=(name, user, priority))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.queued == queued + 1)
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_round_robin_between_users():
+    scheduler = FairScheduler(capacity=1)
+    order = run_queued(scheduler, [
+        ('a1', 'alice', PRIORITY_INTERACTIVE),
+        ('a2', 'alice', PRIORITY_INTERACTIVE),
+        ('a3', 'alice', PRIORITY_INTERACTIVE),
+        ('b1', 'bob', PRIORITY_INTERACTIVE),
+    ])
+    assert order == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_interactive_before_batch():
+    scheduler = FairScheduler(capacity=1)
+    order = run_queued(scheduler, [
+        ('batch', 'alice', PRIORITY_BATCH),
+        ('chat', 'bob', PRIORITY_INTERACTIVE),
+    ])
+    assert order == ['chat', 'batch']
+
+
+def test_starving_batch_request_is_promoted():
+    scheduler = FairScheduler(capacity=1, starvation_seconds=0)
+    order = run_queued(scheduler, [
+        ('batch', 'alice', PRIORITY_BATCH),
+        ('chat', 'bob', PRIORITY_INTERACTIVE),
+    ])
+    assert order == ['batch', 'chat']
+    assert scheduler.stats()[PRIORITY_BATCH]['promoted'] == 1
+
+
+def test_queue_limit_and_timeout():
+    scheduler = FairScheduler(capacity=1, max_queue=0)
+    with scheduler.acquire('alice'):
+        with pytest.raises(SchedulerFullError):
+            scheduler.wait_for_slot('bob')
+
+    scheduler = FairScheduler(capacity=1)
+    with scheduler.acquire('alice'):
+        with pytest.raises(SchedulerTimeoutError):
+            scheduler.wait_for_slot('bob', timeout=0.01)
+        assert scheduler.queued == 0
+    stats = scheduler.stats()
+    assert stats['active'] == 0 and stats[PRIORITY_INTERACTIVE]['timeouts'] == 1
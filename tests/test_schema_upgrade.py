@@ -0,0 +1,98 @@
+import sqlite3
+
+from app import create_app
+from src.extensions import db
+from src.models import Conversation
+from src.routers import captcha_store
+
+# 初始版本的user表（没有tier列）
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL,
+    username VARCHAR(80) NOT NULL,
+    email VARCHAR(120) NOT NULL,
+    password_hash VARCHAR(120) NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (username),
+    UNIQUE (email)
+)
+"""
+
+# 增量预填充之前的conversation表（没有llm_context*列）
+CONVERSATION_SCHEMA = """
+CREATE TABLE conversation (
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    title VARCHAR(200) NOT NULL,
+    message_count INTEGER NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES user (id)
+);
+INSERT INTO conversation VALUES (1, 1, '旧会话', 0, '2025-01-01 00:00:00', '2025-01-01 00:00:00');
+"""
+
+
+def make_app(db_path, schema):
+    connection = sqlite3.connect(db_path)
+    connection.executescript(schema)
+    connection.close()
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}",
+        'SEMANTIC_CACHE_ENABLED': False,
+        'SLOW_REQUEST_MS': None,
+        'BCRYPT_LOG_ROUNDS': 4,
+    })
+
+
+def columns(db_path, table):
+    connection = sqlite3.connect(db_path)
+    try:
+        return {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+    finally:
+        connection.close()
+
+
+def test_init_db_adds_user_tier_to_existing_database(tmp_path):
+    db_path = tmp_path / 'auth.db'
+    app = make_app(db_path, BASELINE_SCHEMA)
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    assert 'user.tier' in result.output
+    assert 'tier' in columns(db_path, 'user')
+
+    # 再次执行不会重复添加
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0 and 'user.tier' not in result.output
+
+    client = app.test_client()
+    response = client.post('/api/register', json={'username': 'alice', 'email': 'alice@example.com',
+                                                   'password': 'password1', 'confirm_password': 'password1'})
+    assert response.status_code == 201, response.get_json()
+
+    captcha_store['127.0.0.1'] = 'abcd'
+    response = client.post('/login', json={'username': 'alice', 'password': 'password1', 'captcha': 'ABCD'})
+    assert response.status_code == 200, response.get_json()
+    with client.session_transaction() as session:
+        assert session['tier'] == 'free'
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_init_db_adds_conversation_context_columns(tmp_path):
+    db_path = tmp_path / 'auth.db'
+    app = make_app(db_path, BASELINE_SCHEMA + ';' + CONVERSATION_SCHEMA)
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    assert {'llm_context', 'llm_context_model', 'llm_context_messages'} <= columns(db_path, 'conversation')
+
+    with app.app_context():
+        conversation = db.session.get(Conversation, 1)
+        assert conversation.title == '旧会话' and conversation.get_llm_context('any') is None
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,58 @@
+from sqlalchemy import delete, text
+
+from src.extensions import db
+from src.models import Conversation, Message
+from src.search import FTS_TABLE, drop_search_index
+
+
+def add_message(user_id, content):
+    conversation = Conversation(user_id=user_id, message_count=1)
+    db.session.add(conversation)
+    db.session.flush()
+    message = Message(conversation_id=conversation.id, role='user', content=content)
+    db.session.add(message)
+    db.session.commit()
+    return message.id
+
+
+def search(client, query):
+    response = client.get('/api/search', query_string={'q': query})
+    assert response.status_code == 200, response.get_json()
+    return [result['message_id'] for result in response.get_json()['results']]
+
+
+def test_search_only_returns_own_messages(app, user, logged_in):
+    with app.app_context():
+        own = add_message(user['id'], '量子纠缠的实验')
+        add_message(user['id'] + 1, '量子纠缠的理论')
+
+    assert search(logged_in, '量子纠缠') == [own]
+    assert search(logged_in, '量子 实验') == [own]
+
+
+def test_index_created_after_startup_is_used(app, user, logged_in):
+    with app.app_context():
+        with db.engine.begin() as connection:
+            drop_search_index(connection)
+        add_message(user['id'], '索引创建之前的消息')
+
+        # 其他进程创建索引表（不经过本进程的create_search_index）
+        with db.engine.begin() as connection:
+            connection.execute(text(f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+                                    f"USING fts5(content, owner, conversation_id UNINDEXED, tokenize = 'trigram')"))
+        message_id = add_message(user['id'], '索引创建之后的消息')
+
+    assert search(logged_in, '之后的消息') == [message_id]
+
+
+def test_insert_replaces_stale_index_rows(app, user, logged_in):
+    with app.app_context():
+        old_id = add_message(user['id'], '旧消息内容')
+        db.session.execute(delete(Message))  # 批量删除不触发ORM事件，索引中残留旧行
+        db.session.commit()
+
+        new_id = add_message(user['id'], '新消息内容')
+        assert new_id == old_id
+
+    assert search(logged_in, '新消息') == [new_id]
+    assert search(logged_in, '旧消息') == []
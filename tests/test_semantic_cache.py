@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from src.semantic_cache import SemanticCache, SemanticCacheConfig  # noqa: E402
+
+
+def make_cache(tmp_path=None, threshold=0.9):
+    cache = SemanticCache(SemanticCacheConfig(threshold=threshold,
+                                              capacity=8,
+                                              path=str(tmp_path / 'cache') if tmp_path else None))
+    vectors = {}
+
+    def embed(text):
+        vector = np.asarray(vectors[text], dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    cache.embed = embed
+    return cache, vectors
+
+
+def test_lookup_ignores_better_match_from_other_model():
+    cache, vectors = make_cache()
+    vectors.update({'q': [1, 0, 0], 'same-model': [0.95, 0.3, 0], 'other-model': [1, 0.01, 0]})
+    cache.store('same-model', '同模型回答', 'small')
+    cache.store('other-model', '其他模型回答', 'large')
+
+    entry, _ = cache.lookup('q', 'small')
+
+    assert entry is not None
+    assert entry['response'] == '同模型回答'
+
+
+def test_lookup_misses_for_unknown_model():
+    cache, vectors = make_cache()
+    vectors.update({'q': [1, 0], 'a': [1, 0]})
+    cache.store('a', '回答', 'small')
+
+    assert cache.lookup('q', 'large')[0] is None
+
+
+def test_entries_survive_reopen(tmp_path):
+    cache, vectors = make_cache(tmp_path)
+    vectors.update({'q': [0, 1], 'a': [0, 1]})
+    cache.store('a', '回答', 'small')
+    cache.close()
+
+    reopened, reopened_vectors = make_cache(tmp_path)
+    reopened_vectors.update(vectors)
+    entry, _ = reopened.lookup('q', 'small')
+    assert entry['response'] == '回答'
+    reopened.close()
+
+
+def test_each_process_owns_a_separate_directory(tmp_path):
+    first, first_vectors = make_cache(tmp_path)
+    second, second_vectors = make_cache(tmp_path)
+    first_vectors['a'] = second_vectors['a'] = [1, 0]
+
+    first.store('a', '1', 'small')
+    second.store('a', '2', 'small')
+
+    assert first.directory == str(tmp_path / 'cache')
+    assert second.directory == str(tmp_path / 'cache') + '-1'
+    first.close()
+    second.close()
+
+    # 目录锁释放后可以重新获取首选目录
+    third, _ = make_cache(tmp_path)
+    third._ensure_open()
+    assert third.directory == str(tmp_path / 'cache')
+    assert os.path.exists(os.path.join(third.directory, SemanticCache.VECTORS_FILE))
+    third.close()
+
+
+def test_close_without_numpy(monkeypatch):
+    import src.semantic_cache as module
+
+    cache = SemanticCache(SemanticCacheConfig())
+    cache._ensure_open()
+    monkeypatch.setattr(module, 'np', None)
+    cache.close()
+    assert not cache.enabled
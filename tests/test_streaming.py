@@ -0,0 +1,233 @@
+import json
+import queue
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.dk_client import LocalLLMClient, LocalLLMConfig
+from src.extensions import model_router
+from src.profiling import PHASE_UPSTREAM_STREAM, PHASE_UPSTREAM_WAIT, timed_upstream
+from src.streaming import SlowClientError, coalesce_frames
+
+
+class HangingUpstream:
+    """模拟模型服务：输出一个数据块后不再发送数据，直到release被置位或客户端断开连接"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.disconnected = threading.Event()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                line = json.dumps({'message': {'role': 'assistant', 'content': '第一块'}, 'done': False}) + '\n'
+                data = line.encode('utf-8')
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                while not upstream.release.is_set():
+                    readable, _, _ = select.select([self.connection], [], [], 0.05)
+                    if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                        upstream.disconnected.set()
+                        return
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/chat"
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = HangingUpstream()
+    yield server
+    server.close()
+
+
+class ControlledSource:
+    """由测试逐条放入数据的上游（放入None表示结束）"""
+
+    def __init__(self):
+        self.queue = queue.Queue()
+
+    def put(self, *items, delay=0):
+        if delay:
+            threading.Timer(delay, lambda: [self.queue.put(item) for item in items]).start()
+        else:
+            for item in items:
+                self.queue.put(item)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            yield item
+
+
+def timed_next(frames):
+    started = time.monotonic()
+    frame = next(frames)
+    return frame, time.monotonic() - started
+
+
+def buffer_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'stream-buffer']
+
+
+def test_first_token_is_flushed_immediately():
+    source = ControlledSource()
+    frames = coalesce_frames(source, window_ms=500, max_window_ms=500)
+    try:
+        source.put('a')
+        frame, elapsed = timed_next(frames)
+        assert frame == 'a' and elapsed < 0.2
+    finally:
+        source.put(None)
+        frames.close()
+
+
+def test_later_tokens_are_merged_until_window_ends():
+    source = ControlledSource()
+    frames = coalesce_frames(source, window_ms=150, max_window_ms=150)
+    try:
+        source.put('a')
+        assert next(frames) == 'a'
+
+        source.put('b', 'c')
+        source.put('d', delay=0.05)  # 窗口内到达，并入同一帧
+        source.put('e', delay=0.4)  # 窗口结束之后到达，单独成帧
+        frame, elapsed = timed_next(frames)
+        assert frame == 'bcd' and 0.1 <= elapsed < 0.35
+        assert next(frames) == 'e'
+
+        source.put(None)
+        assert list(frames) == []
+    finally:
+        source.put(None)
+        frames.close()
+
+
+def test_frame_is_flushed_when_it_reaches_frame_bytes():
+    source = ControlledSource()
+    frames = coalesce_frames(source, window_ms=1000, max_window_ms=1000, frame_bytes=4)
+    try:
+        source.put('a')
+        assert next(frames) == 'a'
+
+        source.put('bb', 'cc', 'dd')
+        frame, elapsed = timed_next(frames)
+        assert frame.startswith('bbcc') and elapsed < 0.5  # 达到frame_bytes后不再等待窗口结束
+    finally:
+        source.put(None)
+        frames.close()
+
+
+def test_window_widens_for_slow_client_up_to_max():
+    source = ControlledSource()
+    frames = coalesce_frames(source, window_ms=10, max_window_ms=200)
+    try:
+        source.put('a')
+        assert next(frames) == 'a'
+
+        # 客户端写出很快：窗口保持最小值
+        source.put('b')
+        frame, elapsed = timed_next(frames)
+        assert frame == 'b' and elapsed < 0.1
+
+        # 客户端写出耗时0.6秒：窗口变大，但不超过max_window_ms
+        time.sleep(0.6)
+        source.put('c')
+        frame, elapsed = timed_next(frames)
+        assert frame == 'c' and 0.15 <= elapsed < 0.45
+    finally:
+        source.put(None)
+        frames.close()
+
+
+def test_close_interrupts_blocked_upstream_read(upstream):
+    client = LocalLLMClient(LocalLLMConfig(endpoint=upstream.url, model_name='test'))
+    source = (chunk['message']['content'] for chunk in client.generate([{'role': 'user', 'content': 'hi'}],
+                                                                       stream=True))
+    frames = coalesce_frames(source, interrupt=lambda thread: client.interrupt(thread.ident))
+
+    assert next(frames) == '第一块'
+    started = time.monotonic()
+    frames.close()
+
+    assert time.monotonic() - started < 2
+    assert not buffer_threads()
+
+
+def test_cancel_stops_producer_before_returning():
+    cancel = threading.Event()
+    released = threading.Event()
+
+    def source():
+        yield 'a'
+        released.wait(10)  # 无法中断的上游：关闭时等待线程退出
+        yield 'b'
+
+    frames = coalesce_frames(source(), cancel=cancel,
+                             interrupt=lambda thread: released.set())
+    assert next(frames) == 'a'
+    cancel.set()
+    assert list(frames) == []
+    assert not buffer_threads()
+
+
+def test_overflow_raises_slow_client_error():
+    frames = coalesce_frames(iter(['x' * 10] * 10), max_buffer_bytes=15)
+    time.sleep(0.05)
+    with pytest.raises(SlowClientError):
+        list(frames)
+
+
+def test_disconnect_releases_slot_after_upstream_is_closed(app, logged_in, upstream):
+    app.config['SLOW_REQUEST_MS'] = None
+    model_router.init_app(app)
+    for route in model_router.routes:
+        model_router.client(route).config.endpoint = upstream.url
+    route = model_router.default_route
+
+    response = logged_in.post('/api/chat', json={'message': 'hi', 'stream': True}, buffered=False)
+    body = iter(response.response)
+    assert '第一块' in next(body).decode('utf-8')
+    assert model_router.stats()[route]['queue']['active'] == 1
+
+    response.close()
+
+    assert model_router.stats()[route]['queue']['active'] == 0
+    assert not buffer_threads()
+    assert upstream.disconnected.wait(2)
+
+
+def test_upstream_timing_is_recorded_in_producer_thread():
+    phases = {}
+
+    def source():
+        time.sleep(0.03)
+        yield 'a'
+        yield 'b'
+
+    frames = coalesce_frames(timed_upstream(source(), phases))
+    assert ''.join(frames) == 'ab'
+    assert phases[PHASE_UPSTREAM_WAIT] >= 0.03 and PHASE_UPSTREAM_STREAM in phases
@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+
+import src.user_io as user_io
+from src.extensions import db
+from src.models import User
+from src.user_io import export_users, hash_password, import_users, validate_user_record
+
+
+def write_jsonl(path, records):
+    path.write_text(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records), encoding='utf-8')
+    return str(path)
+
+
+def test_validate_password_hash_format():
+    valid = hash_password('password1', rounds=4)
+    assert validate_user_record({'username': 'a', 'email': 'a@x.com', 'password_hash': valid})[0]
+    for invalid in ('$2', '$2b$12$short', valid[:-1], valid + 'x', valid.replace('$04$', '$99$')):
+        is_valid, message = validate_user_record({'username': 'a', 'email': 'a@x.com', 'password_hash': invalid})
+        assert not is_valid and 'bcrypt' in message
+
+
+def test_import_then_export_round_trip(app, user, tmp_path):
+    path = write_jsonl(tmp_path / 'users.jsonl', [
+        {'username': 'bob', 'email': 'bob@example.com', 'password': 'password1', 'tier': 'pro'},
+        {'username': 'bob', 'email': 'other@example.com', 'password': 'password1'},
+        {'username': 'alice', 'email': 'new@example.com', 'password': 'password1'},
+        {'username': 'carol', 'email': 'carol@example.com', 'password_hash': hash_password('secret123', rounds=4)},
+        {'username': 'dave', 'email': 'dave@example.com', 'password': 'short'},
+    ])
+    with app.app_context():
+        stats = import_users(db.session, path, workers=1, rounds=4)
+        assert (stats['created'], stats['duplicate'], stats['exists'], stats['invalid']) == (2, 1, 1, 1)
+        assert User.query.filter_by(username='bob').one().check_password('password1')
+        assert User.query.filter_by(username='carol').one().check_password('secret123')
+
+        out = io.StringIO()
+        assert export_users(db.session, out) == 3
+        assert [json.loads(line)['username'] for line in out.getvalue().splitlines()] == ['alice', 'bob', 'carol']
+
+
+def test_dry_run_does_not_start_process_pool(app, tmp_path, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('只校验时不应创建进程池')
+
+    monkeypatch.setattr(user_io, 'ProcessPoolExecutor', no_pool)
+    path = write_jsonl(tmp_path / 'users.jsonl', [{'username': 'bob', 'email': 'bob@example.com',
+                                                   'password': 'password1'}])
+    with app.app_context():
+        stats = import_users(db.session, path, dry_run=True)
+        assert stats['created'] == 1 and User.query.count() == 0  # created为可新建的用户数
+
+
+@pytest.mark.parametrize('conflict', ['username', 'email'])
+def test_concurrent_registration_conflict_counts_as_exists(app, user, tmp_path, monkeypatch, conflict):
+    # 模拟查询之后、插入之前其他请求注册了同名用户
+    monkeypatch.setattr(user_io, 'find_existing', lambda session, usernames, emails: (set(), set()))
+    taken = {'username': 'alice', 'email': 'x@example.com'} if conflict == 'username' else \
+        {'username': 'x', 'email': 'alice@example.com'}
+    path = write_jsonl(tmp_path / 'users.jsonl', [
+        {'username': 'bob', 'email': 'bob@example.com', 'password': 'password1'},
+        {**taken, 'password': 'password1'},
+        {'username': 'carol', 'email': 'carol@example.com', 'password': 'password1'},
+    ])
+    with app.app_context():
+        stats = import_users(db.session, path, workers=1, rounds=4)
+        assert stats['created'] == 2 and stats['exists'] == 1
+        assert sorted(u.username for u in User.query.all()) == ['alice', 'bob', 'carol']
@@ -0,0 +1,57 @@
+import json
+import queue
+import threading
+
+from src.ws_chat import ChatSocket, origin_allowed
+
+
+def test_origin_allowed():
+    assert origin_allowed(None, 'chat.local:5000')
+    assert origin_allowed('http://chat.local:5000', 'chat.local:5000')
+    assert origin_allowed('https://app.example.com/', 'chat.local', ['https://app.example.com'])
+    assert not origin_allowed('https://evil.example.com', 'chat.local:5000')
+    assert not origin_allowed('null', 'chat.local:5000')
+
+
+def test_cross_site_handshake_is_rejected(logged_in):
+    response = logged_in.get('/ws/chat', headers={'Origin': 'https://evil.example.com',
+                                                  'Connection': 'Upgrade', 'Upgrade': 'websocket'})
+    assert response.status_code == 403
+
+
+class FakeWebSocket:
+    def __init__(self, incoming):
+        self.incoming = queue.Queue()
+        for message in incoming:
+            self.incoming.put(json.dumps(message))
+        self.sent = []
+        self.done = threading.Event()
+
+    def receive(self):
+        return self.incoming.get()
+
+    def send(self, data):
+        self.sent.extend(json.loads(line) for line in data.splitlines() if line)
+        if sum(event.get('type') == 'done' for event in self.sent) == 2:
+            self.done.set()
+
+
+def test_concurrent_chats_on_one_connection(app, user, fake_llm):
+    ws = FakeWebSocket([
+        {'type': 'ping'},
+        {'type': 'chat', 'id': 'm1', 'message': '第一问'},
+        {'type': 'chat', 'id': 'm2', 'message': '第二问'},
+    ])
+    socket = ChatSocket(ws, app, user['id'], user['tier'])
+    thread = threading.Thread(target=socket.serve, daemon=True)
+    thread.start()
+    assert ws.done.wait(5)
+    ws.incoming.put(None)
+    thread.join(5)
+
+    assert ws.sent[0] == {'type': 'ready', 'user_id': user['id']}
+    assert {'type': 'pong'} in ws.sent
+    for message_id in ('m1', 'm2'):
+        events = [event for event in ws.sent if event.get('id') == message_id]
+        assert ''.join(event['content'] for event in events if event['type'] == 'answer') == '回答'
+        assert events[-1]['type'] == 'done' and events[-1]['conversation_id']
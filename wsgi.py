@@ -0,0 +1,4 @@
+"""WSGI入口（生产环境）：gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import create_app
+
+app = create_app()